@@ -9,16 +9,30 @@ Step 7 Phase 2: 使用 Streamlit 构建文件整理审批 Dashboard
     streamlit run app.py
 """
 
+import io
 import sys
 import os
+import time
 import json
 import shutil
+import mmap
+import atexit
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 
 import streamlit as st
 import pandas as pd
+import yaml
+
+# 可选：orjson（C 实现，解析/序列化更快），未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 设置页面配置（必须是第一个 Streamlit 命令）
 st.set_page_config(
@@ -30,51 +44,340 @@ st.set_page_config(
 
 # Memory 系统
 from core.memory import MemoryDatabase, ApprovalRepository, PreferenceRepository
-import hashlib
 
 # 导入项目模块
-from utils.file_ops import safe_move_file
+from utils.file_ops import safe_move_file, compute_full_file_hash, discover_files
+
+
+# ==================== 常量 ====================
+
+# 类别 → 图标
+CATEGORY_EMOJI = {
+    "invoice": "💰", "contract": "📝", "paper": "📄",
+    "image": "🖼️", "presentation": "🎨", "default": "📦"
+}
+
+# 历史页面筛选的文档类型选项
+DOC_TYPE_OPTIONS = ["全部", "invoice", "contract", "paper", "presentation", "image", "default"]
+
+# 历史页面显示的列
+HISTORY_DISPLAY_COLS = [
+    'created_at', 'original_filename', 'doc_type', 'vendor',
+    'action', 'final_filename', 'confidence_score'
+]
 
 
 # ==================== 辅助函数 ====================
 
-def load_pending_files() -> List[Dict[str, Any]]:
+@st.cache_resource
+def get_db() -> MemoryDatabase:
     """
-    加载所有待审批文件
+    获取跨会话共享的 MemoryDatabase（引擎和连接池只创建一次）
     
-    Returns:
-        包含待审批信息的字典列表
+    MemoryDatabase 使用 scoped_session，各脚本线程拿到各自的 Session，可安全共享
+    """
+    db = MemoryDatabase()
+    atexit.register(db.engine.dispose)
+    return db
+
+
+# Memory 查询结果缓存时间（秒）
+MEMORY_CACHE_TTL = 30
+
+
+@st.cache_data(ttl=MEMORY_CACHE_TTL, show_spinner=False)
+def _load_statistics(days: int) -> Dict[str, Any]:
+    """审批统计（缓存）"""
+    return ApprovalRepository(get_db()).get_statistics(days=days)
+
+
+@st.cache_data(ttl=MEMORY_CACHE_TTL, show_spinner=False)
+def _load_doc_type_counts() -> Dict[str, int]:
+    """各文档类型数量（缓存）"""
+    return ApprovalRepository(get_db()).get_doc_type_counts()
+
+
+@st.cache_data(ttl=MEMORY_CACHE_TTL, show_spinner=False)
+def _load_daily_counts(days: int) -> Dict[Any, int]:
+    """每日处理数量（缓存）"""
+    return ApprovalRepository(get_db()).get_daily_counts(days=days)
+
+
+@st.cache_data(ttl=MEMORY_CACHE_TTL, show_spinner=False)
+def _load_recent_approvals(cols: tuple, **filters) -> List[Dict]:
+    """审批历史（缓存，只含指定列）"""
+    return ApprovalRepository(get_db()).get_recent_approvals_cols(list(cols), **filters)
+
+
+@st.cache_data(ttl=MEMORY_CACHE_TTL, show_spinner=False)
+def _load_preferences() -> List[Dict]:
+    """学习到的偏好（缓存）"""
+    return PreferenceRepository(get_db()).list_all_preferences()
+
+
+def clear_memory_caches():
+    """写入 Memory 后清除查询缓存，使各页面立即看到最新数据"""
+    for loader in (
+        _load_statistics, _load_doc_type_counts, _load_daily_counts,
+        _load_recent_approvals, _load_preferences
+    ):
+        loader.clear()
+
+
+def _loads(data: bytes) -> Any:
+    """解析 JSON（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumpb(obj: Any) -> bytes:
+    """序列化 JSON 为 UTF-8 字节（优先使用 orjson，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+class UIEventLog:
+    """
+    UI 事件日志追加器
+    
+    长期持有 logs/ui_events.jsonl 的缓冲文件句柄，避免每条日志都 open/close。
+    默认每条写入后立即 flush；在 batch() 上下文中只在结束时 flush 一次。
+    """
+    
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(path, "ab", buffering=64 * 1024)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        atexit.register(self.close)
+    
+    def write(self, line: bytes):
+        """追加一行日志（line 需以换行结尾）"""
+        with self._lock:
+            self._fh.write(line)
+            if not getattr(self._local, "batching", False):
+                self._fh.flush()
+    
+    @contextmanager
+    def batch(self):
+        """批量写入：期间不逐条 flush，退出时统一 flush"""
+        self._local.batching = True
+        try:
+            yield self
+        finally:
+            self._local.batching = False
+            with self._lock:
+                self._fh.flush()
+    
+    def close(self):
+        """关闭文件句柄"""
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+
+@st.cache_resource
+def get_event_log() -> UIEventLog:
+    """获取跨 rerun 共享的 UI 事件日志追加器"""
+    return UIEventLog(Path("logs") / "ui_events.jsonl")
+
+
+# 优先使用 libyaml 的 C 解析器，不可用时回退到纯 Python SafeLoader
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@st.cache_data(show_spinner=False)
+def _load_config(mtime_ns: int) -> Dict[str, Any]:
+    """
+    解析 config.yaml（按修改时间缓存，文件变化时自动失效）
+    
+    Args:
+        mtime_ns: 配置文件的修改时间（纳秒），仅用作缓存键
+    """
+    return yaml.load(Path("config.yaml").read_bytes(), Loader=_YAML_LOADER) or {}
+
+
+def get_config() -> Dict[str, Any]:
+    """获取配置（config.yaml 不存在时返回空字典）"""
+    try:
+        mtime_ns = Path("config.yaml").stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _load_config(mtime_ns)
+
+
+def _pending_signature() -> tuple:
+    """
+    计算 pending 目录的签名（文件名 + 修改时间）
+    
+    目录内容不变时签名不变，用作 _load_pending 的缓存键
     """
     pending_dir = Path("pending")
     if not pending_dir.exists():
-        return []
+        return ()
+    entries = []
+    for p in pending_dir.glob("*.json"):
+        try:
+            entries.append((p.name, p.stat().st_mtime_ns))
+        except OSError:
+            # 列出后被审批/删除的文件直接跳过
+            continue
+    return tuple(sorted(entries))
+
+
+@st.cache_data(show_spinner=False)
+def _load_pending(signature: tuple) -> tuple[list, list]:
+    """
+    按签名解析待审批 JSON（结果缓存，目录变化时自动失效）
     
-    pending_items = []
-    for json_file in sorted(pending_dir.glob("*.json"), key=lambda x: x.stat().st_mtime, reverse=True):
+    Returns:
+        (待审批项列表, 读取失败的 (文件名, 错误) 列表)
+    """
+    pending_dir = Path("pending")
+    files = sorted(signature, key=lambda x: x[1], reverse=True)
+    if not files:
+        return [], []
+    
+    def _parse_one(entry: tuple):
+        name, mtime_ns = entry
+        json_file = pending_dir / name
         try:
-            with json_file.open("r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = _loads(json_file.read_bytes())
             
-            # 添加文件路径和创建时间
+            # 添加文件路径和修改时间
             data["_json_file"] = str(json_file)
             data["_json_name"] = json_file.name
-            
-            # 计算文件年龄
-            created_at = datetime.fromisoformat(data.get("created_at", datetime.now().isoformat()))
-            data["_age"] = datetime.now() - created_at
-            
-            pending_items.append(data)
+            data["_mtime"] = mtime_ns / 1e9
+            return data, None
         except Exception as e:
-            st.error(f"❌ 读取 {json_file.name} 失败: {e}")
+            return None, (name, str(e))
+    
+    # 并发读取，重叠各文件的 I/O 等待
+    with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
+        results = list(executor.map(_parse_one, files))
+    
+    pending_items = [data for data, _ in results if data is not None]
+    errors = [error for _, error in results if error is not None]
+    
+    return pending_items, errors
+
+
+def load_pending_files() -> List[Dict[str, Any]]:
+    """
+    加载所有待审批文件
+    
+    Returns:
+        包含待审批信息的字典列表
+    """
+    pending_items, errors = _load_pending(_pending_signature())
+    
+    for name, error in errors:
+        st.error(f"❌ 读取 {name} 失败: {error}")
+    
+    # 计算文件年龄（随时间变化，不进入缓存；直接用 JSON 文件的修改时间）
+    now_ts = time.time()
+    for data in pending_items:
+        data["_age_seconds"] = now_ts - data["_mtime"]
     
     return pending_items
 
 
+def compute_file_hashes(paths: List[Path]) -> List[Optional[str]]:
+    """
+    并行计算多个文件的完整 SHA256
+    
+    hashlib 在 C 层计算时释放 GIL，线程池可以同时读盘和计算
+    
+    Args:
+        paths: 文件路径列表
+    
+    Returns:
+        与 paths 一一对应的 hash 列表（读取失败的为 None）
+    """
+    if not paths:
+        return []
+    
+    def _hash_or_none(path: Path) -> Optional[str]:
+        try:
+            return compute_full_file_hash(path)
+        except OSError:
+            return None
+    
+    max_workers = min(8, os.cpu_count() or 1, len(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_hash_or_none, paths))
+
+
+def build_approval_log(
+    pending_item: Dict[str, Any],
+    action: str,
+    final_filename: str,
+    final_folder: str,
+    file_hash: Optional[str] = None,
+    file_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    构建写入 Memory 系统的审批日志数据
+    
+    Args:
+        pending_item: 待审批项数据
+        action: 操作类型 (approved/modified/rejected)
+        final_filename: 最终文件名
+        final_folder: 最终文件夹
+        file_hash: 预先计算的文件 hash（为 None 时现场计算）
+        file_size: 预先获取的文件大小（为 None 时现场获取）
+    
+    Returns:
+        ApprovalLog 字段字典
+    """
+    src_file = Path(pending_item["original_file"])
+    
+    # 计算文件 hash
+    if file_hash is None:
+        file_hash = compute_full_file_hash(src_file)
+    if file_size is None:
+        file_size = src_file.stat().st_size if src_file.exists() else 0
+    
+    return {
+        'session_id': f"ui_{time.strftime('%Y%m%d_%H%M%S')}",
+        'file_hash': file_hash,
+        'original_filename': pending_item.get("original_name", ""),
+        'original_path': pending_item.get("original_file", ""),
+        'file_size_bytes': file_size,
+        
+        # AI 分析
+        'doc_type': pending_item.get("category"),
+        'vendor': pending_item.get("extracted", {}).get("vendor"),
+        'extracted_date': pending_item.get("extracted", {}).get("date"),
+        'confidence_score': pending_item.get("confidence", 0.0),
+        
+        # 建议 vs 实际
+        'suggested_filename': pending_item.get("new_name", ""),
+        'suggested_folder': pending_item.get("dest_dir", ""),
+        'final_filename': final_filename,
+        'final_folder': final_folder,
+        
+        # 决策
+        'action': action,
+        'user_modified_filename': final_filename != pending_item.get("new_name"),
+        'user_modified_folder': final_folder != pending_item.get("dest_dir"),
+        
+        # 处理信息
+        'processing_time_ms': 0,  # UI 操作无此信息
+        'extraction_method': 'unknown',
+        'operator': 'ui_user'
+    }
+
+
 def save_approval_to_memory(
     pending_item: Dict[str, Any],
     action: str,
     final_filename: str,
-    final_folder: str
+    final_folder: str,
+    file_hash: Optional[str] = None,
+    file_size: Optional[int] = None
 ):
     """
     保存审批决策到 Memory 系统
@@ -84,66 +387,38 @@ def save_approval_to_memory(
         action: 操作类型 (approved/modified/rejected)
         final_filename: 最终文件名
         final_folder: 最终文件夹
+        file_hash: 预先计算的文件 hash（可选）
+        file_size: 预先获取的文件大小（可选）
     """
     try:
-        with MemoryDatabase() as db:
-            repo = ApprovalRepository(db)
-            
-            # 计算文件 hash
-            src_file = Path(pending_item["original_file"])
-            hasher = hashlib.sha256()
-            if src_file.exists():
-                hasher.update(str(src_file.stat().st_size).encode('utf-8'))
-                with open(src_file, 'rb') as f:
-                    hasher.update(f.read(8192))
-            file_hash = hasher.hexdigest()
-            
-            # 准备日志数据
-            log_data = {
-                'session_id': f"ui_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                'file_hash': file_hash,
-                'original_filename': pending_item.get("original_name", ""),
-                'original_path': pending_item.get("original_file", ""),
-                'file_size_bytes': src_file.stat().st_size if src_file.exists() else 0,
-                
-                # AI 分析
-                'doc_type': pending_item.get("category"),
-                'vendor': pending_item.get("extracted", {}).get("vendor"),
-                'extracted_date': pending_item.get("extracted", {}).get("date"),
-                'confidence_score': pending_item.get("confidence", 0.0),
-                
-                # 建议 vs 实际
-                'suggested_filename': pending_item.get("new_name", ""),
-                'suggested_folder': pending_item.get("dest_dir", ""),
-                'final_filename': final_filename,
-                'final_folder': final_folder,
-                
-                # 决策
-                'action': action,
-                'user_modified_filename': final_filename != pending_item.get("new_name"),
-                'user_modified_folder': final_folder != pending_item.get("dest_dir"),
-                
-                # 处理信息
-                'processing_time_ms': 0,  # UI 操作无此信息
-                'extraction_method': 'unknown',
-                'operator': 'ui_user'
-            }
-            
-            # 保存到数据库
-            repo.save_approval(log_data)
-            
+        repo = ApprovalRepository(get_db())
+        log_data = build_approval_log(
+            pending_item, action, final_filename, final_folder, file_hash, file_size
+        )
+        
+        # 保存到数据库
+        repo.save_approval(log_data)
+        clear_memory_caches()
+        
     except Exception as e:
         # 保存失败不影响主流程
         print(f"⚠️  Failed to save to memory: {e}")
 
 
-def approve_file(pending_item: Dict[str, Any], archive_root: Path) -> tuple[bool, str]:
+def approve_file(
+    pending_item: Dict[str, Any],
+    archive_root: Path,
+    memory_logs: Optional[List[Dict[str, Any]]] = None,
+    file_hash: Optional[str] = None
+) -> tuple[bool, str]:
     """
     批准并执行文件移动
     
     Args:
         pending_item: 待审批项数据
         archive_root: 归档根目录
+        memory_logs: 可选，传入时只把审批日志追加到该列表，由调用方批量写入 Memory
+        file_hash: 可选，预先计算的源文件 hash
     
     Returns:
         (成功标志, 消息)
@@ -159,21 +434,34 @@ def approve_file(pending_item: Dict[str, Any], archive_root: Path) -> tuple[bool
         if not src.exists():
             return False, f"源文件不存在: {src}"
         
-        # 3. 执行文件移动
+        # 3. 移动前记录文件指纹（移动后原路径不再存在）
+        if file_hash is None:
+            file_hash = compute_full_file_hash(src)
+        file_size = src.stat().st_size
+        
+        # 4. 执行文件移动
         result = safe_move_file(src, dst)
         
         if result["status"] == "success":
-            # 4. 删除 pending JSON
+            # 5. 删除 pending JSON
             json_file = Path(pending_item["_json_file"])
             json_file.unlink()
+            _load_pending.clear()
             
-            # 5. 写入日志
+            # 6. 写入日志
             log_event("approve", pending_item, result)
             
-            # 6. 🆕 保存到 Memory 系统
+            # 7. 🆕 保存到 Memory 系统
             final_folder = dest_dir
             final_filename = Path(result["dst"]).name
-            save_approval_to_memory(pending_item, "approved", final_filename, final_folder)
+            if memory_logs is not None:
+                memory_logs.append(build_approval_log(
+                    pending_item, "approved", final_filename, final_folder, file_hash, file_size
+                ))
+            else:
+                save_approval_to_memory(
+                    pending_item, "approved", final_filename, final_folder, file_hash, file_size
+                )
             
             moved_to = result["dst"]
             conflict_msg = " (已自动重命名)" if result.get("conflict_resolved") else ""
@@ -185,13 +473,18 @@ def approve_file(pending_item: Dict[str, Any], archive_root: Path) -> tuple[bool
         return False, f"处理失败: {str(e)}"
 
 
-def reject_file(pending_item: Dict[str, Any], move_to_quarantine: bool = False) -> tuple[bool, str]:
+def reject_file(
+    pending_item: Dict[str, Any],
+    move_to_quarantine: bool = False,
+    create_dirs: bool = True
+) -> tuple[bool, str]:
     """
     拒绝文件
     
     Args:
         pending_item: 待审批项数据
         move_to_quarantine: 是否移动到隔离区
+        create_dirs: 是否创建隔离区目录（批量调用时由调用方预先创建）
     
     Returns:
         (成功标志, 消息)
@@ -210,10 +503,16 @@ def reject_file(pending_item: Dict[str, Any], move_to_quarantine: bool = False)
         if move_to_quarantine:
             # 移动到隔离区
             quarantine_dir = Path("quarantine/rejected")
-            quarantine_dir.mkdir(parents=True, exist_ok=True)
+            if create_dirs:
+                quarantine_dir.mkdir(parents=True, exist_ok=True)
             
             dest = quarantine_dir / json_file.name
-            shutil.move(str(json_file), str(dest))
+            try:
+                # 同一文件系统上是一次原子 rename
+                os.replace(json_file, dest)
+            except OSError:
+                # 跨文件系统时回退到复制 + 删除
+                shutil.move(str(json_file), str(dest))
             
             msg = f"⏭️ 已拒绝并移动到隔离区"
         else:
@@ -221,6 +520,8 @@ def reject_file(pending_item: Dict[str, Any], move_to_quarantine: bool = False)
             json_file.unlink()
             msg = f"⏭️ 已拒绝"
         
+        _load_pending.clear()
+        
         # 写入日志
         log_event("reject", pending_item, {"quarantined": move_to_quarantine})
         
@@ -239,11 +540,6 @@ def log_event(action: str, pending_item: Dict[str, Any], result: Dict[str, Any])
         pending_item: 待审批项数据
         result: 操作结果
     """
-    log_dir = Path("logs")
-    log_dir.mkdir(parents=True, exist_ok=True)
-    
-    log_file = log_dir / "ui_events.jsonl"
-    
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "action": action,
@@ -253,38 +549,91 @@ def log_event(action: str, pending_item: Dict[str, Any], result: Dict[str, Any])
         "result": result,
     }
     
-    with log_file.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+    get_event_log().write(_dumpb(log_entry) + b"\n")
+
+
+def _count_today_from_end(log_file: Path, today_prefix: str) -> tuple[int, int]:
+    """
+    从文件末尾向前扫描，统计今日日志条数
+    
+    日志按时间顺序追加，遇到早于今天的记录即可停止，
+    耗时只与今日的日志量相关，与历史总量无关。
+    
+    Args:
+        log_file: 日志文件路径
+        today_prefix: 今日日期前缀（YYYY-MM-DD）
+    
+    Returns:
+        (今日条数, 已扫描到的完整行末尾偏移)
+    """
+    count = 0
+    with log_file.open("rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # 只处理完整的行，末尾未写完的行留到下次
+            end = mm.rfind(b"\n") + 1
+            pos = end - 1
+            while pos > 0:
+                start = mm.rfind(b"\n", 0, pos) + 1
+                line = mm[start:pos]
+                pos = start - 1
+                try:
+                    # ISO 时间戳按字典序排序，直接比较日期前缀，无需解析时间
+                    entry_date = _loads(line)["timestamp"][:10]
+                except:
+                    continue
+                if entry_date < today_prefix:
+                    break
+                if entry_date == today_prefix:
+                    count += 1
+    return count, end
 
 
 def get_today_logs() -> int:
-    """获取今日已处理数量"""
+    """
+    获取今日已处理数量
+    
+    首次（或跨天、日志被截断后）从文件末尾反向扫描今日记录；
+    之后在 session_state 中记录已解析的字节偏移，只解析新追加的日志行
+    """
     log_file = Path("logs/ui_events.jsonl")
     if not log_file.exists():
         return 0
     
-    today = datetime.now().date()
-    count = 0
+    today_prefix = datetime.now().strftime("%Y-%m-%d")
+    cache = st.session_state.get("_today_log_cache")
     
     try:
-        with log_file.open("r", encoding="utf-8") as f:
-            for line in f:
+        size = log_file.stat().st_size
+        if cache is None or cache["date"] != today_prefix or size < cache["offset"]:
+            cache = {"offset": 0, "date": today_prefix, "count": 0}
+            if size > 0:
+                cache["count"], cache["offset"] = _count_today_from_end(log_file, today_prefix)
+        
+        elif size > cache["offset"]:
+            with log_file.open("rb") as f:
+                f.seek(cache["offset"])
+                data = f.read(size - cache["offset"])
+            
+            # 只处理完整的行，末尾未写完的行留到下次
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
                 try:
-                    entry = json.loads(line)
-                    entry_date = datetime.fromisoformat(entry["timestamp"]).date()
-                    if entry_date == today:
-                        count += 1
+                    if _loads(line)["timestamp"].startswith(today_prefix):
+                        cache["count"] += 1
                 except:
                     continue
+            cache["offset"] += end
+        
+        st.session_state["_today_log_cache"] = cache
     except:
-        pass
+        return cache["count"] if cache else 0
     
-    return count
+    return cache["count"]
 
 
-def format_age(age: timedelta) -> str:
-    """格式化文件年龄"""
-    total_seconds = int(age.total_seconds())
+def format_age(age_seconds: float) -> str:
+    """格式化文件年龄（秒）"""
+    total_seconds = int(age_seconds)
     
     if total_seconds < 60:
         return f"{total_seconds}秒前"
@@ -296,6 +645,60 @@ def format_age(age: timedelta) -> str:
         return f"{total_seconds // 86400}天前"
 
 
+# ==================== 离线批量分析 ====================
+
+@st.cache_resource
+def get_workflow():
+    """
+    获取跨会话共享的 JanitorWorkflow（用于提交/收取离线批量分析）
+    
+    LangGraph 与 LLM 相关依赖较重，首次使用时才导入
+    """
+    from run_graph_once import JanitorWorkflow
+    return JanitorWorkflow()
+
+
+def queue_inbox_for_batch() -> tuple[bool, str]:
+    """
+    将 inbox 中的文件提交到 Batch API 离线分析（非交互，结果稍后收取）
+    
+    Returns:
+        (成功与否, 消息)
+    """
+    try:
+        workflow = get_workflow()
+        files = discover_files(workflow.inbox)
+        if not files:
+            return False, "inbox 为空，无文件可提交"
+        
+        batch_id = workflow.submit_batch_job(files)
+        if batch_id is None:
+            return False, "inbox 中的文件均已在排队中"
+        return True, f"已提交 Batch 任务 {batch_id}，结果通常在 24 小时内就绪"
+        
+    except Exception as e:
+        return False, f"提交失败: {str(e)}"
+
+
+def collect_batch_results() -> tuple[bool, str]:
+    """
+    收取已完成的 Batch 任务，结果写入待审批队列
+    
+    Returns:
+        (成功与否, 消息)
+    """
+    try:
+        records, running = get_workflow().collect_batch_jobs()
+    except Exception as e:
+        return False, f"收取失败: {str(e)}"
+    
+    pending_count = sum(1 for record in records if record.get("decision") == "pending")
+    msg = f"新增 {pending_count} 个待审批项"
+    if running:
+        msg += f"，{running} 个任务仍在处理中"
+    return True, msg
+
+
 # ==================== 侧边栏 ====================
 
 def render_sidebar():
@@ -317,7 +720,9 @@ def render_sidebar():
         # 统计信息
         st.header("📊 统计信息")
         
-        pending_count = len(load_pending_files())
+        # 只统计文件数量，不解析 JSON（完整解析留给主界面）
+        pending_dir = Path("pending")
+        pending_count = sum(1 for _ in pending_dir.glob("*.json")) if pending_dir.exists() else 0
         today_count = get_today_logs()
         
         col1, col2 = st.columns(2)
@@ -333,12 +738,8 @@ def render_sidebar():
         
         # 读取配置
         try:
-            import yaml
-            config_path = Path("config.yaml")
-            if config_path.exists():
-                with config_path.open("r", encoding="utf-8") as f:
-                    config = yaml.safe_load(f)
-                
+            config = get_config()
+            if config:
                 dry_run = config.get("dry_run", True)
                 archive_path = config.get("paths", {}).get("archive", "archive")
                 
@@ -365,6 +766,36 @@ def render_sidebar():
         
         st.markdown("---")
         
+        # 离线批量分析：大批量扫描走 Batch API（费用约为实时分析的一半，不受速率限制）
+        st.header("🌙 离线批量分析")
+        
+        batch_dir = Path("pending/batches")
+        batch_count = sum(1 for _ in batch_dir.glob("*.json")) if batch_dir.exists() else 0
+        st.metric("排队中的任务", batch_count, help="已提交到 Batch API、尚未收取结果的任务数")
+        
+        if st.button("🌙 排队夜间处理", use_container_width=True,
+                     help="将 inbox 中的文件提交到 Batch API，24 小时内完成"):
+            with st.spinner("提交中..."):
+                success, msg = queue_inbox_for_batch()
+            
+            if success:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.warning(msg)
+        
+        if st.button("📥 收取批量结果", use_container_width=True, disabled=batch_count == 0):
+            with st.spinner("收取中..."):
+                success, msg = collect_batch_results()
+            
+            if success:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
+        
+        st.markdown("---")
+        
         # 帮助信息
         with st.expander("ℹ️ 帮助"):
             st.markdown("""
@@ -373,6 +804,7 @@ def render_sidebar():
             2. 点击"批准"执行文件移动
             3. 点击"拒绝"删除待审批项
             4. 所有操作都会记录到日志
+            5. 大批量文件可"排队夜间处理"，完成后"收取批量结果"进入待审批队列
             
             **提示：**
             - 批准后文件会立即移动
@@ -427,9 +859,7 @@ def render_main():
     
     # 加载配置
     try:
-        import yaml
-        with Path("config.yaml").open("r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
         archive_root = Path(config["paths"]["archive"])
     except:
         archive_root = Path("archive")
@@ -467,10 +897,7 @@ def render_pending_item(item: Dict[str, Any], index: int, archive_root: Path):
                 category = item.get('category', 'default')
                 confidence = item.get('confidence', 0.0)
                 
-                category_emoji = {
-                    "invoice": "💰", "contract": "📝", "paper": "📄",
-                    "image": "🖼️", "presentation": "🎨", "default": "📦"
-                }.get(category, "📦")
+                category_emoji = CATEGORY_EMOJI.get(category, "📦")
                 
                 st.metric(
                     f"{category_emoji} {category.upper()}",
@@ -479,8 +906,8 @@ def render_pending_item(item: Dict[str, Any], index: int, archive_root: Path):
                 )
                 
                 # 文件年龄
-                age = item.get('_age')
-                if age:
+                age = item.get('_age_seconds')
+                if age is not None:
                     st.caption(f"⏱️ {format_age(age)}")
             
             # 第二行：详细信息（改为直接显示，避免嵌套 expander）
@@ -557,9 +984,7 @@ def render_pending_item(item: Dict[str, Any], index: int, archive_root: Path):
 def approve_all(pending_items: List[Dict[str, Any]]):
     """批准所有文件"""
     try:
-        import yaml
-        with Path("config.yaml").open("r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
         archive_root = Path(config["paths"]["archive"])
     except:
         archive_root = Path("archive")
@@ -570,17 +995,34 @@ def approve_all(pending_items: List[Dict[str, Any]]):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, item in enumerate(pending_items):
-        status_text.text(f"处理中: {item.get('original_name')} ({i+1}/{len(pending_items)})")
-        
-        success, msg = approve_file(item, archive_root)
-        if success:
-            success_count += 1
-        else:
-            fail_count += 1
-            st.error(f"{item.get('original_name')}: {msg}")
-        
-        progress_bar.progress((i + 1) / len(pending_items))
+    memory_logs: List[Dict[str, Any]] = []
+    
+    # 并行预先计算所有源文件 hash
+    file_hashes = compute_file_hashes([Path(item["original_file"]) for item in pending_items])
+    
+    with get_event_log().batch():
+        for i, item in enumerate(pending_items):
+            status_text.text(f"处理中: {item.get('original_name')} ({i+1}/{len(pending_items)})")
+            
+            success, msg = approve_file(
+                item, archive_root, memory_logs=memory_logs, file_hash=file_hashes[i]
+            )
+            if success:
+                success_count += 1
+            else:
+                fail_count += 1
+                st.error(f"{item.get('original_name')}: {msg}")
+            
+            progress_bar.progress((i + 1) / len(pending_items))
+    
+    # 一次事务批量写入 Memory 系统
+    if memory_logs:
+        try:
+            ApprovalRepository(get_db()).save_approvals_bulk(memory_logs)
+            clear_memory_caches()
+        except Exception as e:
+            # 保存失败不影响主流程
+            print(f"⚠️  Failed to save to memory: {e}")
     
     status_text.empty()
     progress_bar.empty()
@@ -595,8 +1037,11 @@ def approve_all(pending_items: List[Dict[str, Any]]):
 
 def reject_all(pending_items: List[Dict[str, Any]]):
     """拒绝所有文件"""
-    for item in pending_items:
-        reject_file(item, move_to_quarantine=True)
+    Path("quarantine/rejected").mkdir(parents=True, exist_ok=True)
+    
+    with get_event_log().batch():
+        for item in pending_items:
+            reject_file(item, move_to_quarantine=True, create_dirs=False)
     
     st.warning(f"⏭️ 已拒绝全部 {len(pending_items)} 个文件")
     st.rerun()
@@ -609,96 +1054,90 @@ def render_history_page():
     st.title("📜 审批历史")
     
     try:
-        with MemoryDatabase() as db:
-            repo = ApprovalRepository(db)
-            
-            # 统计卡片
-            stats = repo.get_statistics(days=30)
-            
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("总处理数", stats['total_approvals'])
-            with col2:
-                st.metric("最近30天", stats['recent_count'])
-            with col3:
-                approved = stats['action_breakdown'].get('approved', 0) + stats['action_breakdown'].get('modified', 0)
-                st.metric("通过", approved)
-            with col4:
-                rejected = stats['action_breakdown'].get('rejected', 0) + stats['action_breakdown'].get('skipped', 0)
-                st.metric("拒绝", rejected)
-            
-            st.markdown("---")
+        # 统计卡片
+        stats = _load_statistics(30)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("总处理数", stats['total_approvals'])
+        with col2:
+            st.metric("最近30天", stats['recent_count'])
+        with col3:
+            approved = stats['action_breakdown'].get('approved', 0) + stats['action_breakdown'].get('modified', 0)
+            st.metric("通过", approved)
+        with col4:
+            rejected = stats['action_breakdown'].get('rejected', 0) + stats['action_breakdown'].get('skipped', 0)
+            st.metric("拒绝", rejected)
+        
+        st.markdown("---")
+        
+        # 筛选器
+        st.subheader("🔍 筛选条件")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            doc_type_filter = st.selectbox(
+                "文档类型",
+                DOC_TYPE_OPTIONS
+            )
+        
+        with col2:
+            vendor_filter = st.text_input("供应商（模糊搜索）")
+        
+        with col3:
+            limit = st.number_input("显示数量", min_value=10, max_value=500, value=50)
+        
+        # 查询
+        filters = {
+            'doc_type': None if doc_type_filter == "全部" else doc_type_filter,
+            'vendor': vendor_filter if vendor_filter else None,
+            'limit': limit
+        }
+        
+        # 只查询显示的列
+        results = _load_recent_approvals(tuple(HISTORY_DISPLAY_COLS), **filters)
+        
+        if results:
+            st.success(f"找到 {len(results)} 条记录")
             
-            # 筛选器
-            st.subheader("🔍 筛选条件")
-            col1, col2, col3 = st.columns(3)
+            # 转为 DataFrame
+            df = pd.DataFrame(results, columns=HISTORY_DISPLAY_COLS)
+            df['confidence_score'] = df['confidence_score'].astype('float32')
             
-            with col1:
-                doc_type_filter = st.selectbox(
-                    "文档类型",
-                    ["全部", "invoice", "contract", "paper", "presentation", "image", "default"]
-                )
+            # 格式化时间
+            df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d %H:%M')
             
-            with col2:
-                vendor_filter = st.text_input("供应商（模糊搜索）")
+            # 显示表格
+            st.dataframe(
+                df,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "created_at": "时间",
+                    "original_filename": "原始文件名",
+                    "doc_type": "类型",
+                    "vendor": "供应商",
+                    "action": "操作",
+                    "final_filename": "最终文件名",
+                    "confidence_score": st.column_config.NumberColumn("置信度", format="%.2f")
+                }
+            )
             
-            with col3:
-                limit = st.number_input("显示数量", min_value=10, max_value=500, value=50)
-            
-            # 查询
-            filters = {
-                'doc_type': None if doc_type_filter == "全部" else doc_type_filter,
-                'vendor': vendor_filter if vendor_filter else None,
-                'limit': limit
-            }
-            
-            results = repo.get_recent_approvals(**filters)
+            # 导出功能
+            # 直接写入字节缓冲区，BOM 只写一次（便于 Excel 识别 UTF-8）
+            buf = io.BytesIO()
+            buf.write(b'\xef\xbb\xbf')
+            df.to_csv(buf, index=False, lineterminator='\n')
+            csv = buf.getvalue()
+            st.download_button(
+                label="📥 导出为 CSV",
+                data=csv,
+                file_name=f"approval_history_{time.strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+        else:
+            st.info("没有找到匹配的记录")
             
-            if results:
-                st.success(f"找到 {len(results)} 条记录")
-                
-                # 转为 DataFrame
-                df = pd.DataFrame(results)
-                
-                # 格式化时间
-                df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d %H:%M')
-                
-                # 选择显示的列
-                display_cols = [
-                    'created_at', 'original_filename', 'doc_type', 'vendor',
-                    'action', 'final_filename', 'confidence_score'
-                ]
-                
-                # 过滤存在的列
-                display_cols = [col for col in display_cols if col in df.columns]
-                
-                # 显示表格
-                st.dataframe(
-                    df[display_cols],
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "created_at": "时间",
-                        "original_filename": "原始文件名",
-                        "doc_type": "类型",
-                        "vendor": "供应商",
-                        "action": "操作",
-                        "final_filename": "最终文件名",
-                        "confidence_score": st.column_config.NumberColumn("置信度", format="%.2f")
-                    }
-                )
-                
-                # 导出功能
-                csv = df.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="📥 导出为 CSV",
-                    data=csv,
-                    file_name=f"approval_history_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.info("没有找到匹配的记录")
-                
     except Exception as e:
         st.error(f"加载历史记录失败: {e}")
 
@@ -708,60 +1147,58 @@ def render_preferences_page():
     st.title("🧠 学习到的偏好")
     
     try:
-        with MemoryDatabase() as db:
-            repo = PreferenceRepository(db)
+        # 获取所有偏好
+        prefs = _load_preferences()
+        
+        if prefs:
+            st.success(f"发现 {len(prefs)} 条学习到的偏好")
             
-            # 获取所有偏好
-            prefs = repo.list_all_preferences()
+            # 按类型分组显示
+            vendor_folder_prefs = [p for p in prefs if p['type'] == 'vendor_folder']
             
-            if prefs:
-                st.success(f"发现 {len(prefs)} 条学习到的偏好")
-                
-                # 按类型分组显示
-                vendor_folder_prefs = [p for p in prefs if p['type'] == 'vendor_folder']
-                
-                if vendor_folder_prefs:
-                    st.subheader("📁 供应商文件夹映射")
-                    
-                    for pref in vendor_folder_prefs:
-                        with st.expander(f"{pref['vendor']} + {pref['doc_type']} → {pref['value']}"):
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric("置信度", f"{pref['confidence']:.0%}")
-                            with col2:
-                                st.metric("样本数", pref['sample_count'])
-                            with col3:
-                                st.text(f"最后更新: {pref['last_seen'][:10] if pref['last_seen'] else 'N/A'}")
-                            
-                            if st.button(f"🗑️ 删除", key=f"del_{pref['id']}"):
-                                repo.disable_preference(pref['id'])
-                                st.success("已删除")
-                                st.rerun()
-                
-                # 转为表格显示
-                df = pd.DataFrame(vendor_folder_prefs)
-                if not df.empty:
-                    st.dataframe(
-                        df[['vendor', 'doc_type', 'value', 'confidence', 'sample_count']],
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            "vendor": "供应商",
-                            "doc_type": "文档类型",
-                            "value": "目标文件夹",
-                            "confidence": st.column_config.NumberColumn("置信度", format="%.2f"),
-                            "sample_count": "样本数"
-                        }
-                    )
-            else:
-                st.info("还没有学习到任何偏好")
-                st.markdown("""
-                💡 **如何让系统学习？**
-                1. 在审批时，如果 AI 建议的文件夹不正确
-                2. 你多次将某个供应商的文件移动到特定文件夹
-                3. 系统会自动学习这个偏好，下次自动应用
-                """)
+            if vendor_folder_prefs:
+                st.subheader("📁 供应商文件夹映射")
                 
+                for pref in vendor_folder_prefs:
+                    with st.expander(f"{pref['vendor']} + {pref['doc_type']} → {pref['value']}"):
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("置信度", f"{pref['confidence']:.0%}")
+                        with col2:
+                            st.metric("样本数", pref['sample_count'])
+                        with col3:
+                            st.text(f"最后更新: {pref['last_seen'][:10] if pref['last_seen'] else 'N/A'}")
+                        
+                        if st.button(f"🗑️ 删除", key=f"del_{pref['id']}"):
+                            PreferenceRepository(get_db()).disable_preference(pref['id'])
+                            clear_memory_caches()
+                            st.success("已删除")
+                            st.rerun()
+            
+            # 转为表格显示
+            df = pd.DataFrame(vendor_folder_prefs)
+            if not df.empty:
+                st.dataframe(
+                    df[['vendor', 'doc_type', 'value', 'confidence', 'sample_count']],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "vendor": "供应商",
+                        "doc_type": "文档类型",
+                        "value": "目标文件夹",
+                        "confidence": st.column_config.NumberColumn("置信度", format="%.2f"),
+                        "sample_count": "样本数"
+                    }
+                )
+        else:
+            st.info("还没有学习到任何偏好")
+            st.markdown("""
+            💡 **如何让系统学习？**
+            1. 在审批时，如果 AI 建议的文件夹不正确
+            2. 你多次将某个供应商的文件移动到特定文件夹
+            3. 系统会自动学习这个偏好，下次自动应用
+            """)
+            
     except Exception as e:
         st.error(f"加载偏好失败: {e}")
 
@@ -773,192 +1210,179 @@ def render_dashboard_page():
     st.markdown("---")
     
     try:
-        with MemoryDatabase() as db:
-            repo = ApprovalRepository(db)
-            
-            # 获取统计数据
-            stats = repo.get_statistics(days=30)
-            all_approvals = repo.get_recent_approvals(limit=1000)
-            
-            # === 1. 关键指标 (KPI) ===
-            st.subheader("📊 关键指标")
-            
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                total = stats['total_approvals']
-                st.metric(
-                    "总处理文件数",
-                    f"{total:,}",
-                    help="系统启动以来处理的文件总数"
-                )
-            
-            with col2:
-                # 计算自动化率
-                approved_count = stats['action_breakdown'].get('approved', 0)
-                automation_rate = (approved_count / total * 100) if total > 0 else 0
-                st.metric(
-                    "自动化率",
-                    f"{automation_rate:.1f}%",
-                    help="直接批准（未修改）的文件占比"
-                )
-            
-            with col3:
-                # 估算节省时间（假设每个文件手动处理需要2分钟）
-                time_saved_minutes = total * 2
-                if time_saved_minutes >= 60:
-                    time_saved_display = f"{time_saved_minutes // 60:.1f}小时"
-                else:
-                    time_saved_display = f"{time_saved_minutes}分钟"
-                
-                st.metric(
-                    "节省时间估算",
-                    time_saved_display,
-                    help="假设每个文件手动整理需要2分钟"
-                )
-            
-            with col4:
-                recent = stats['recent_count']
-                st.metric(
-                    "最近30天",
-                    f"{recent:,}",
-                    help="最近30天处理的文件数"
-                )
-            
-            st.markdown("---")
-            
-            # === 2. 图表 1: 文件类型分布 ===
-            st.subheader("📁 文件类型分布")
-            
-            if all_approvals:
-                # 统计文件类型
-                df_all = pd.DataFrame(all_approvals)
-                
-                if 'doc_type' in df_all.columns:
-                    type_counts = df_all['doc_type'].value_counts()
-                    
-                    # 创建两列布局
-                    col1, col2 = st.columns([2, 1])
-                    
-                    with col1:
-                        # 使用 bar_chart
-                        st.bar_chart(type_counts)
-                    
-                    with col2:
-                        # 显示详细数据
-                        st.dataframe(
-                            pd.DataFrame({
-                                '类型': type_counts.index,
-                                '数量': type_counts.values,
-                                '占比': [f"{v/type_counts.sum()*100:.1f}%" for v in type_counts.values]
-                            }),
-                            use_container_width=True,
-                            hide_index=True
-                        )
-                else:
-                    st.info("暂无文件类型数据")
-            else:
-                st.info("暂无数据")
-            
-            st.markdown("---")
-            
-            # === 3. 图表 2: 最近7天处理量趋势 ===
-            st.subheader("📈 最近7天处理量趋势")
-            
-            if all_approvals:
-                df_all = pd.DataFrame(all_approvals)
-                
-                if 'created_at' in df_all.columns:
-                    # 转换时间格式
-                    df_all['date'] = pd.to_datetime(df_all['created_at']).dt.date
-                    
-                    # 获取最近7天的数据
-                    last_7_days = pd.date_range(
-                        end=datetime.now().date(),
-                        periods=7
-                    ).date
-                    
-                    # 统计每天的处理量
-                    daily_counts = df_all.groupby('date').size()
-                    
-                    # 创建完整的7天数据（包括0的天数）
-                    trend_data = pd.Series(
-                        [daily_counts.get(day, 0) for day in last_7_days],
-                        index=last_7_days
-                    )
-                    
-                    # 创建两列布局
-                    col1, col2 = st.columns([2, 1])
-                    
-                    with col1:
-                        st.line_chart(trend_data)
-                    
-                    with col2:
-                        st.dataframe(
-                            pd.DataFrame({
-                                '日期': [str(d) for d in trend_data.index],
-                                '处理量': trend_data.values
-                            }),
-                            use_container_width=True,
-                            hide_index=True
-                        )
-                else:
-                    st.info("暂无时间数据")
+        # 获取统计数据
+        stats = _load_statistics(30)
+        
+        # === 1. 关键指标 (KPI) ===
+        st.subheader("📊 关键指标")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            total = stats['total_approvals']
+            st.metric(
+                "总处理文件数",
+                f"{total:,}",
+                help="系统启动以来处理的文件总数"
+            )
+        
+        with col2:
+            # 计算自动化率
+            approved_count = stats['action_breakdown'].get('approved', 0)
+            automation_rate = (approved_count / total * 100) if total > 0 else 0
+            st.metric(
+                "自动化率",
+                f"{automation_rate:.1f}%",
+                help="直接批准（未修改）的文件占比"
+            )
+        
+        with col3:
+            # 估算节省时间（假设每个文件手动处理需要2分钟）
+            time_saved_minutes = total * 2
+            if time_saved_minutes >= 60:
+                time_saved_display = f"{time_saved_minutes // 60:.1f}小时"
             else:
-                st.info("暂无数据")
+                time_saved_display = f"{time_saved_minutes}分钟"
             
-            st.markdown("---")
-            
-            # === 4. 图表 3: Top 5 供应商 ===
-            st.subheader("🏢 Top 5 最常出现的供应商")
-            
-            top_vendors = stats.get('top_vendors', [])
+            st.metric(
+                "节省时间估算",
+                time_saved_display,
+                help="假设每个文件手动整理需要2分钟"
+            )
+        
+        with col4:
+            recent = stats['recent_count']
+            st.metric(
+                "最近30天",
+                f"{recent:,}",
+                help="最近30天处理的文件数"
+            )
+        
+        st.markdown("---")
+        
+        # === 2. 图表 1: 文件类型分布 ===
+        st.subheader("📁 文件类型分布")
+        
+        if total > 0:
+            # 统计文件类型（SQL 端聚合）
+            type_counts = pd.Series(_load_doc_type_counts(), dtype="int64")
             
-            if top_vendors:
-                # 转为 DataFrame
-                vendor_df = pd.DataFrame(top_vendors, columns=['供应商', '文件数'])
-                vendor_df = vendor_df.head(5)  # 只取前5个
-                
+            if not type_counts.empty:
                 # 创建两列布局
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
                     # 使用 bar_chart
-                    chart_data = vendor_df.set_index('供应商')
-                    st.bar_chart(chart_data)
+                    st.bar_chart(type_counts)
                 
                 with col2:
-                    # 显示表格
+                    # 显示详细数据
+                    type_pct = type_counts / type_counts.sum() * 100
                     st.dataframe(
-                        vendor_df,
+                        pd.DataFrame({
+                            '类型': type_counts.index,
+                            '数量': type_counts.values,
+                            '占比': type_pct.map('{:.1f}%'.format).values
+                        }),
                         use_container_width=True,
                         hide_index=True
                     )
             else:
-                st.info("暂无供应商数据")
+                st.info("暂无文件类型数据")
+        else:
+            st.info("暂无数据")
+        
+        st.markdown("---")
+        
+        # === 3. 图表 2: 最近7天处理量趋势 ===
+        st.subheader("📈 最近7天处理量趋势")
+        
+        if total > 0:
+            # 获取最近7天的数据
+            last_7_days = pd.date_range(
+                end=datetime.now().date(),
+                periods=7
+            ).date
             
-            st.markdown("---")
+            # 统计每天的处理量（SQL 端聚合）
+            daily_counts = pd.Series(_load_daily_counts(7), dtype="int64")
             
-            # === 5. 额外信息 ===
-            st.subheader("ℹ️ 系统信息")
+            # 创建完整的7天数据（包括0的天数）
+            trend_data = daily_counts.reindex(last_7_days, fill_value=0)
             
-            col1, col2 = st.columns(2)
+            # 创建两列布局
+            col1, col2 = st.columns([2, 1])
             
             with col1:
-                st.info(f"📊 **操作分布**")
-                for action, count in stats['action_breakdown'].items():
-                    percentage = (count / total * 100) if total > 0 else 0
-                    st.text(f"• {action}: {count} ({percentage:.1f}%)")
+                st.line_chart(trend_data)
             
             with col2:
-                avg_time = stats['avg_processing_time_ms']
-                st.info(f"⏱️ **平均处理时间**")
-                st.text(f"• {avg_time:.0f} ms/文件")
-                
-                if total > 0:
-                    total_time_seconds = total * avg_time / 1000
-                    st.text(f"• 累计: {total_time_seconds:.1f} 秒")
+                st.dataframe(
+                    pd.DataFrame({
+                        '日期': [str(d) for d in trend_data.index],
+                        '处理量': trend_data.values
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+        else:
+            st.info("暂无数据")
+        
+        st.markdown("---")
+        
+        # === 4. 图表 3: Top 5 供应商 ===
+        st.subheader("🏢 Top 5 最常出现的供应商")
+        
+        top_vendors = stats.get('top_vendors', [])
+        
+        if top_vendors:
+            # 转为 DataFrame
+            vendor_df = pd.DataFrame(top_vendors, columns=['供应商', '文件数'])
+            vendor_df = vendor_df.head(5)  # 只取前5个
+            
+            # 创建两列布局
+            col1, col2 = st.columns([2, 1])
+            
+            with col1:
+                # 使用 bar_chart
+                chart_data = vendor_df.set_index('供应商')
+                st.bar_chart(chart_data)
             
+            with col2:
+                # 显示表格
+                st.dataframe(
+                    vendor_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
+        else:
+            st.info("暂无供应商数据")
+        
+        st.markdown("---")
+        
+        # === 5. 额外信息 ===
+        st.subheader("ℹ️ 系统信息")
+        
+        col1, col2 = st.columns(2)
+        
+        # 每列合并为一次 markdown 输出，而不是逐行 st.text
+        with col1:
+            st.info(f"📊 **操作分布**")
+            rows = "\n".join(
+                f"| {action} | {count} | {(count / total * 100) if total > 0 else 0:.1f}% |"
+                for action, count in stats['action_breakdown'].items()
+            )
+            st.markdown(f"| 操作 | 次数 | 占比 |\n|---|---|---|\n{rows}")
+        
+        with col2:
+            avg_time = stats['avg_processing_time_ms']
+            st.info(f"⏱️ **平均处理时间**")
+            rows = [f"| 平均 | {avg_time:.0f} ms/文件 |"]
+            if total > 0:
+                total_time_seconds = total * avg_time / 1000
+                rows.append(f"| 累计 | {total_time_seconds:.1f} 秒 |")
+            st.markdown("| 指标 | 数值 |\n|---|---|\n" + "\n".join(rows))
+        
     except Exception as e:
         st.error(f"加载统计数据失败: {e}")
         st.exception(e)  # 显示详细错误信息
@@ -3,6 +3,7 @@ OCR 相关配置
 用于智能 PDF 识别增强功能
 """
 
+import re
 from dataclasses import dataclass, field
 from typing import List
 
@@ -20,6 +21,8 @@ class OcrConfig:
     vision_max_pages: int = 3
     vision_dpi: int = 150
     vision_model: str = "Qwen/Qwen3-VL-30B-A3B-Thinking"
+    vision_max_dim: int = 1568          # 上传前页面图片的最长边上限（像素）
+    vision_grayscale: bool = True       # 近似无彩色的页面转灰度后再编码
     
     # 触发阈值
     ocr_trigger_chars_per_page: int = 100
@@ -42,6 +45,24 @@ class OcrConfig:
     # 调试选项
     save_debug_images: bool = False  # 是否保存调试图片
     debug_image_dir: str = "logs/ocr_debug"
+    
+    def __post_init__(self):
+        self._rebuild_keyword_index()
+    
+    def _rebuild_keyword_index(self):
+        """预编译重要文档关键词（修改 important_keywords 后需重新调用）"""
+        self._keyword_source = tuple(self.important_keywords)
+        self._keyword_set = frozenset(k.lower() for k in self.important_keywords)
+        self._keyword_pattern = re.compile(
+            "|".join(map(re.escape, self.important_keywords)), re.IGNORECASE
+        ) if self.important_keywords else None
+    
+    def has_important_keyword(self, text: str) -> bool:
+        """文本（如文件名）中是否包含任一重要文档关键词（忽略大小写，一次正则扫描）"""
+        if self._keyword_source != tuple(self.important_keywords):
+            # important_keywords 被直接修改过
+            self._rebuild_keyword_index()
+        return self._keyword_pattern is not None and self._keyword_pattern.search(text) is not None
 
 
 # 全局配置实例
@@ -64,4 +85,7 @@ def update_ocr_config(**kwargs):
             setattr(OCR_CONFIG, key, value)
         else:
             raise ValueError(f"未知的配置项: {key}")
+    
+    if "important_keywords" in kwargs:
+        OCR_CONFIG._rebuild_keyword_index()
 
@@ -8,11 +8,12 @@ from core.validator import validate_plan, validate_plans_batch, get_validation_s
 
 # 延迟导入 llm_processor，避免在没有安装 langchain 时导入失败
 try:
-    from core.llm_processor import analyze_file
+    from core.llm_processor import analyze_file, analyze_file_async
     __all__ = [
         "FileAnalysis", 
         "RenamePlan",
         "analyze_file",
+        "analyze_file_async",
         "validate_plan",
         "validate_plans_batch",
         "get_validation_stats"
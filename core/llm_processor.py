@@ -2,51 +2,187 @@
 LLM 处理器模块
 使用大语言模型分析文件内容并提取结构化信息
 支持视觉 LLM 分析扫描 PDF
+
+langchain / pypdfium2 等重依赖在首次实际调用时才导入，
+仅导入本模块（如只浏览历史记录）时不承担其导入开销。
 """
 
+from __future__ import annotations
+
 import os
+import json
+import asyncio
 import time
 import base64
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from typing import Callable, Optional, Dict, Any, TYPE_CHECKING
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.schemas import FileAnalysis, FileAnalysisBatch
 
-from core.schemas import FileAnalysis
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# 可选：orjson（C 实现，解析/序列化更快），未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 
-# 初始化 LLM 客户端（从环境变量读取配置）
-def get_llm_client() -> ChatOpenAI:
+@lru_cache(maxsize=1)
+def _get_pdfium():
     """
-    获取 LLM 客户端实例
-    从环境变量读取配置：
-    - LLM_MODEL: 模型名称（默认: gpt-3.5-turbo）
-    - OPENAI_API_BASE: API 基础URL（可选）
-    - OPENAI_API_KEY: API 密钥
+    导入 pypdfium2（结果缓存）
+    
+    可选依赖：进程内渲染 PDF，无需 poppler；未安装时返回 None，回退到 pdf2image
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    return pypdfium2
+
+
+@lru_cache(maxsize=4)
+def _build_llm(
+    model: str,
+    api_base: Optional[str],
+    api_key: str,
+    temperature: float,
+    max_tokens: Optional[int] = None
+) -> ChatOpenAI:
     """
-    model = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
-    api_base = os.getenv("OPENAI_API_BASE")
-    api_key = os.getenv("OPENAI_API_KEY", "sk-dummy")
+    按配置构建 ChatOpenAI 实例（结果缓存）
     
+    相同配置复用同一个实例及其 HTTP 连接池，避免每次调用重复创建客户端和 TLS 握手。
+    """
     kwargs = {
         "model": model,
         "api_key": api_key,
-        "temperature": 0.1,  # 低温度，更确定性的输出
+        "temperature": temperature,
     }
     
     # 如果设置了自定义 API base，添加到参数中
     if api_base:
         kwargs["base_url"] = api_base
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    
+    from langchain_openai import ChatOpenAI
     
     return ChatOpenAI(**kwargs)
 
+
+def _llm_config() -> tuple:
+    """从环境变量读取文本 LLM 配置，返回 _build_llm 的参数元组"""
+    return (
+        os.getenv("LLM_MODEL", "gpt-3.5-turbo"),
+        os.getenv("OPENAI_API_BASE"),
+        os.getenv("OPENAI_API_KEY", "sk-dummy"),
+        0.1,  # 低温度，更确定性的输出
+    )
+
+
+# 初始化 LLM 客户端（从环境变量读取配置）
+def get_llm_client() -> ChatOpenAI:
+    """
+    获取 LLM 客户端实例（配置不变时复用缓存实例）
+    从环境变量读取配置：
+    - LLM_MODEL: 模型名称（默认: gpt-3.5-turbo）
+    - OPENAI_API_BASE: API 基础URL（可选）
+    - OPENAI_API_KEY: API 密钥
+    """
+    return _build_llm(*_llm_config())
+
+
+@lru_cache(maxsize=8)
+def _build_structured_llm(config: tuple, schema: type):
+    """构建绑定输出结构的 LLM（结果缓存，避免每次调用重新包装 runnable）"""
+    return _build_llm(*config).with_structured_output(schema)
+
+
+def get_structured_llm(schema: type):
+    """
+    获取强制返回指定 Pydantic 结构的 LLM
+    
+    Args:
+        schema: 输出结构（如 FileAnalysis）
+    """
+    return _build_structured_llm(_llm_config(), schema)
+
+
+class _RateLimiter:
+    """
+    令牌桶限流器（线程安全，同步与异步调用共用同一个桶）
+    
+    每次调用预约一个令牌：令牌不足时计算需要等待的时间，
+    并发调用按预约顺序依次错开，稳定在 rpm 上限而不触发 429。
+    """
+    
+    def __init__(self, rpm: int):
+        self.rate = rpm / 60.0
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0
+            return max(0.0, -self.tokens / self.rate)
+    
+    def __enter__(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+    
+    async def __aenter__(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+@lru_cache(maxsize=4)
+def _build_rate_limiter(rpm: int):
+    """按 rpm 构建限流器（结果缓存，所有调用共用）；rpm <= 0 表示不限流"""
+    if rpm <= 0:
+        return nullcontext()
+    return _RateLimiter(rpm)
+
+
+def get_rate_limiter():
+    """
+    获取 LLM 请求限流器（同时支持 with 和 async with）
+    从环境变量读取配置：
+    - LLM_RATE_LIMIT_RPM: 每分钟最大请求数（默认不限流）
+    """
+    return _build_rate_limiter(int(os.getenv("LLM_RATE_LIMIT_RPM") or 0))
+
+
 def get_vision_llm_client() -> ChatOpenAI:
     """
-    获取视觉 LLM 客户端 (Qwen-VL)
+    获取视觉 LLM 客户端 (Qwen-VL)（配置不变时复用缓存实例）
     """
     # 优先读取 VISION_ 开头的配置，如果没有则回退到默认的 OPENAI_ 配置
     model = os.getenv("VISION_MODEL_NAME", "Qwen/Qwen3-VL-30B-A3B-Thinking")
@@ -58,42 +194,17 @@ def get_vision_llm_client() -> ChatOpenAI:
     if not api_key:
         raise ValueError("未配置 API Key")
 
-    return ChatOpenAI(
-        model=model,
-        api_key=api_key,
-        base_url=api_base,
-        temperature=0.1, # 视觉任务通常需要低温度以保证准确
-        max_tokens=2048  # 视觉描述通常需要较长输出
+    return _build_llm(
+        model,
+        api_base,
+        api_key,
+        0.1,  # 视觉任务通常需要低温度以保证准确
+        2048  # 视觉描述通常需要较长输出
     )
 
 
-def analyze_file(text: str, filename: str, max_preview: int = 1000) -> FileAnalysis:
-    """
-    使用 LLM 分析文件内容，返回结构化的文件元数据
-    
-    Args:
-        text: 文件内容预览（可能为空）
-        filename: 原始文件名
-        max_preview: 最大预览字符数（默认 1000）
-    
-    Returns:
-        FileAnalysis: 结构化的文件分析结果
-    
-    Raises:
-        Exception: 当 LLM 调用失败时抛出异常
-    """
-    # 获取 LLM 客户端
-    llm = get_llm_client()
-    
-    # 使用 structured output 强制返回 FileAnalysis 格式
-    structured_llm = llm.with_structured_output(FileAnalysis)
-    
-    # 截断文本预览
-    text_preview = text[:max_preview] if text else ""
-    has_content = bool(text_preview.strip())
-    
-    # 构建系统提示词
-    system_prompt = """你是一个专业的文件归档助手。你的任务是根据文件名和文件内容预览，推断文件的元数据。
+# 系统提示词（单文件与批量分析共用）
+SYSTEM_PROMPT = """你是一个专业的文件归档助手。你的任务是根据文件名和文件内容预览，推断文件的元数据。
 
 **分类规则：**
 - invoice (发票): 包含发票、税号、价税合计、增值税等关键词
@@ -118,9 +229,32 @@ def analyze_file(text: str, filename: str, max_preview: int = 1000) -> FileAnaly
 - 标题要简洁，不超过 30 个字符
 - rationale 简要说明分类依据"""
 
-    # 构建用户提示词
-    if has_content:
-        user_prompt = f"""请分析以下文件：
+# 批量分析的附加说明
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+**批量模式：**
+- 输入包含多个文件，以 "--- FILE n: 文件名" 分隔
+- 对每个文件分别输出一条结果，file_index 填写对应的序号 n
+- 各文件互相独立，不要混用不同文件的信息"""
+
+
+def _fallback_analysis(filename: str, confidence: float, reason: str) -> FileAnalysis:
+    """LLM 调用失败时返回的保守默认分类"""
+    return FileAnalysis(
+        category="default",
+        confidence=confidence,
+        extracted_date=None,
+        extracted_amount=None,
+        vendor_or_party=None,
+        title=filename,
+        suggested_filename=f"[其他]_{filename}",
+        rationale=reason,
+        metadata={}
+    )
+
+
+# 单文件用户提示词模板
+_USER_PROMPT_TEMPLATE = """请分析以下文件：
 
 **文件名**: {filename}
 
@@ -128,83 +262,501 @@ def analyze_file(text: str, filename: str, max_preview: int = 1000) -> FileAnaly
 {text_preview}
 
 请根据上述信息，提取文件的元数据并进行分类。"""
-    else:
-        user_prompt = f"""请分析以下文件：
+
+_USER_PROMPT_EMPTY_TEMPLATE = """请分析以下文件：
 
 **文件名**: {filename}
 
 **注意**: 文件内容为空或无法读取，请仅根据文件名进行判断。
 
 请根据上述信息，提取文件的元数据并进行分类。"""
+
+@lru_cache(maxsize=2)
+def _system_message(batch: bool = False):
+    """构建系统消息（只构建一次，所有调用共用）"""
+    from langchain_core.messages import SystemMessage
+    
+    return SystemMessage(content=BATCH_SYSTEM_PROMPT if batch else SYSTEM_PROMPT)
+
+
+def _build_user_prompt(text: str, filename: str, max_preview: int = 1000) -> str:
+    """构建单文件分析的用户提示词"""
+    # 截断文本预览
+    text_preview = text[:max_preview] if text else ""
+    
+    if text_preview.strip():
+        return _USER_PROMPT_TEMPLATE.format(filename=filename, text_preview=text_preview)
+    return _USER_PROMPT_EMPTY_TEMPLATE.format(filename=filename)
+
+
+# LLM 分析结果缓存有效期（天）
+LLM_CACHE_TTL_DAYS = 30
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+# 进程内缓存层（位于 SQLite 缓存之前）：cache_key -> (FileAnalysis, 写入时间)
+LLM_MEMORY_CACHE_SIZE = 1024
+_llm_memory_cache: "OrderedDict[str, tuple[FileAnalysis, float]]" = OrderedDict()
+
+
+def _memory_cache_get(cache_key: str) -> Optional[FileAnalysis]:
+    """查询进程内缓存（需持有 _llm_cache_lock）"""
+    entry = _llm_memory_cache.get(cache_key)
+    if entry is None:
+        return None
+    result, stored_at = entry
+    if time.time() - stored_at > LLM_CACHE_TTL_DAYS * 86400:
+        del _llm_memory_cache[cache_key]
+        return None
+    _llm_memory_cache.move_to_end(cache_key)
+    return result
+
+
+def _memory_cache_put(cache_key: str, result: FileAnalysis) -> None:
+    """写入进程内缓存，超出容量时淘汰最久未使用的条目（需持有 _llm_cache_lock）"""
+    _llm_memory_cache[cache_key] = (result, time.time())
+    _llm_memory_cache.move_to_end(cache_key)
+    if len(_llm_memory_cache) > LLM_MEMORY_CACHE_SIZE:
+        _llm_memory_cache.popitem(last=False)
+
+
+def _get_llm_cache():
+    """获取 LLM 结果缓存仓库（首次调用时打开 Memory 数据库，不可用时返回 None）"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            try:
+                from core.memory import MemoryDatabase, LLMCacheRepository
+                _llm_cache = LLMCacheRepository(MemoryDatabase())
+            except Exception as e:
+                logger.warning("LLM 结果缓存不可用: %s", e)
+                _llm_cache = False
+    return _llm_cache or None
+
+
+def _analysis_cache_key(text_preview: str, filename: str, model: str, api_base: Optional[str] = None) -> str:
+    """计算分析结果的缓存键（预览文本 + 文件名 + 模型 + API 地址；切换服务端时不复用旧结果）"""
+    h = hashlib.blake2b(digest_size=16)
+    for part in (text_preview, filename, model, api_base or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def analyze_file(
+    text: str,
+    filename: str,
+    max_preview: int = 1000,
+    use_cache: bool = True,
+    force_refresh: bool = False
+) -> FileAnalysis:
+    """
+    使用 LLM 分析文件内容，返回结构化的文件元数据
+    
+    相同的 (预览文本, 文件名, 模型) 命中持久化缓存时直接返回，不调用 LLM。
+    
+    Args:
+        text: 文件内容预览（可能为空）
+        filename: 原始文件名
+        max_preview: 最大预览字符数（默认 1000）
+        use_cache: 是否使用持久化结果缓存
+        force_refresh: 忽略已有缓存，重新调用 LLM 并刷新缓存
+    
+    Returns:
+        FileAnalysis: 结构化的文件分析结果
+    
+    Raises:
+        Exception: 当 LLM 调用失败时抛出异常
+    """
+    cached, store = _cache_lookup(text, filename, max_preview, use_cache, force_refresh)
+    if cached is not None:
+        return cached
+    return _analyze_uncached(text, filename, max_preview, store)
+
+
+def _analyze_uncached(
+    text: str,
+    filename: str,
+    max_preview: int,
+    store: Callable[[FileAnalysis], None]
+) -> FileAnalysis:
+    """
+    调用 LLM 分析单个文件（不查缓存），成功时通过 store 写入缓存
+    
+    LLM 调用失败时返回 fallback 结果（不写入缓存）
+    """
+    # 使用 structured output 强制返回 FileAnalysis 格式（缓存实例）
+    structured_llm = get_structured_llm(FileAnalysis)
+    
+    # 构建用户提示词
+    user_prompt = _build_user_prompt(text, filename, max_preview)
     
     # 调用 LLM
     try:
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
+        from langchain_core.messages import HumanMessage
+        
+        messages = [_system_message(), HumanMessage(content=user_prompt)]
         
-        result: FileAnalysis = structured_llm.invoke(messages)
-        return result
+        with get_rate_limiter():
+            result: FileAnalysis = structured_llm.invoke(messages)
         
     except Exception as e:
-        # LLM 调用失败时，返回一个默认的 fallback 结果
-        print(f"[WARN] LLM 调用失败: {e}")
-        print(f"[INFO] 使用 fallback 规则处理文件: {filename}")
+        # LLM 调用失败时，返回一个默认的 fallback 结果（不写入缓存）
+        logger.warning("LLM 调用失败，使用 fallback 规则处理文件 %s: %s", filename, e)
         
         # 返回一个保守的默认分类
-        return FileAnalysis(
-            category="default",
-            confidence=0.3,
-            extracted_date=None,
-            extracted_amount=None,
-            vendor_or_party=None,
-            title=filename,
-            suggested_filename=f"[其他]_{filename}",
-            rationale=f"LLM 调用失败，使用 fallback 规则: {str(e)[:100]}",
-            metadata={}
-        )
+        return _fallback_analysis(filename, 0.3, f"LLM 调用失败，使用 fallback 规则: {str(e)[:100]}")
+    
+    store(result)
+    return result
 
 
-def analyze_file_batch(files: list[tuple[str, str]], max_workers: int = 3) -> list[FileAnalysis]:
+async def analyze_file_async(
+    text: str,
+    filename: str,
+    max_preview: int = 1000,
+    use_cache: bool = True,
+    force_refresh: bool = False
+) -> FileAnalysis:
+    """
+    analyze_file 的异步版本（参数与返回值相同）
+    
+    多个文件可用 asyncio.gather 并发分析，总耗时约为最慢的一次请求而非逐个累加。
+    缓存读写在线程中执行，不阻塞事件循环。
     """
-    批量分析文件（并发处理）
+    cached, store = await asyncio.to_thread(
+        _cache_lookup, text, filename, max_preview, use_cache, force_refresh
+    )
+    if cached is not None:
+        return cached
+    
+    structured_llm = get_structured_llm(FileAnalysis)
+    user_prompt = _build_user_prompt(text, filename, max_preview)
+    
+    try:
+        from langchain_core.messages import HumanMessage
+        
+        messages = [_system_message(), HumanMessage(content=user_prompt)]
+        
+        async with get_rate_limiter():
+            result: FileAnalysis = await structured_llm.ainvoke(messages)
+        
+    except Exception as e:
+        logger.warning("LLM 调用失败，使用 fallback 规则处理文件 %s: %s", filename, e)
+        return _fallback_analysis(filename, 0.3, f"LLM 调用失败，使用 fallback 规则: {str(e)[:100]}")
+    
+    await asyncio.to_thread(store, result)
+    return result
+
+
+def _cache_lookup(
+    text: str,
+    filename: str,
+    max_preview: int,
+    use_cache: bool,
+    force_refresh: bool
+) -> tuple[Optional[FileAnalysis], Callable[[FileAnalysis], None]]:
+    """
+    查询 LLM 结果缓存
+    
+    Returns:
+        (命中的结果或 None, 写入本次结果到缓存的函数)
+    """
+    cache = _get_llm_cache() if use_cache else None
+    if cache is None:
+        return None, lambda result: None
+    
+    model, api_base = _llm_config()[:2]
+    cache_key = _analysis_cache_key(text[:max_preview] if text else "", filename, model, api_base)
+    
+    def store(result: FileAnalysis) -> None:
+        with _llm_cache_lock:
+            cache.put(cache_key, model, result.model_dump())
+            _memory_cache_put(cache_key, result)
+    
+    if not force_refresh:
+        with _llm_cache_lock:
+            # 先查进程内缓存（FileAnalysis 不可变，可直接共享），再查 SQLite
+            result = _memory_cache_get(cache_key)
+            if result is None:
+                cached = cache.get(cache_key, ttl_days=LLM_CACHE_TTL_DAYS)
+                if cached is not None:
+                    result = FileAnalysis.from_cached(cached)
+                    _memory_cache_put(cache_key, result)
+        if result is not None:
+            logger.debug("LLM 缓存命中: %s", filename)
+            return result, store
+    
+    return None, store
+
+
+def _analyze_chunk(
+    chunk: list[tuple[str, str, Callable[[FileAnalysis], None]]],
+    max_preview: int = 1000
+) -> list[FileAnalysis]:
+    """
+    在一次 LLM 调用中分析多个文件（调用方已确认均未命中缓存）
+    
+    Args:
+        chunk: (text, filename, store) 元组列表；store 用于把结果写入缓存
+        max_preview: 每个文件的最大预览字符数
+    
+    Returns:
+        与 chunk 顺序一致的 FileAnalysis 列表；
+        批量结果缺失或解析失败的文件回退为单文件调用
+    """
+    if len(chunk) == 1:
+        text, filename, store = chunk[0]
+        return [_analyze_uncached(text, filename, max_preview, store)]
+    
+    # 按 "--- FILE n" 分隔拼接所有文件
+    sections = []
+    for idx, (text, filename, _) in enumerate(chunk, 1):
+        text_preview = text[:max_preview] if text else ""
+        if not text_preview.strip():
+            text_preview = "（文件内容为空或无法读取，请仅根据文件名进行判断）"
+        sections.append(f"--- FILE {idx}: {filename}\nCONTENT:\n{text_preview}")
+    
+    user_prompt = (
+        f"请分别分析以下 {len(chunk)} 个文件，提取每个文件的元数据并进行分类：\n\n"
+        + "\n\n".join(sections)
+    )
+    
+    by_index: dict[int, FileAnalysis] = {}
+    try:
+        from langchain_core.messages import HumanMessage
+        
+        structured_llm = get_structured_llm(FileAnalysisBatch)
+        with get_rate_limiter():
+            batch: FileAnalysisBatch = structured_llm.invoke([
+                _system_message(batch=True),
+                HumanMessage(content=user_prompt)
+            ])
+        for item in batch.results:
+            if 1 <= item.file_index <= len(chunk) and item.file_index not in by_index:
+                by_index[item.file_index] = FileAnalysis.from_cached(
+                    item.model_dump(exclude={"file_index"})
+                )
+    except Exception as e:
+        logger.warning("批量 LLM 调用失败，逐个处理 %d 个文件: %s", len(chunk), e)
+    
+    results = []
+    for idx, (text, filename, store) in enumerate(chunk, 1):
+        result = by_index.get(idx)
+        if result is None:
+            result = _analyze_uncached(text, filename, max_preview, store)
+        else:
+            store(result)
+        results.append(result)
+    return results
+
+
+def analyze_file_batch(
+    files: list[tuple[str, str]],
+    max_workers: int = 3,
+    batch_size: int = 8,
+    max_preview: int = 1000,
+    use_cache: bool = True
+) -> list[FileAnalysis]:
+    """
+    批量分析文件
+    
+    先逐个查询结果缓存，只把未命中的文件每 batch_size 个合并为一次 LLM 调用
+    （摊薄网络往返与系统提示词开销），多个分组再并发提交；新结果写入缓存。
     
     Args:
         files: (text, filename) 元组列表
         max_workers: 最大并发数
+        batch_size: 每次 LLM 调用包含的文件数（1 表示逐个调用）
+        max_preview: 每个文件的最大预览字符数
+        use_cache: 是否使用持久化结果缓存
     
     Returns:
-        FileAnalysis 结果列表
+        FileAnalysis 结果列表（与输入顺序一致）
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    results: list[Optional[FileAnalysis]] = [None] * len(files)
+    
+    # 1. 查询缓存，收集未命中的文件
+    misses: list[int] = []
+    stores: dict[int, Callable[[FileAnalysis], None]] = {}
+    for i, (text, filename) in enumerate(files):
+        cached, store = _cache_lookup(text, filename, max_preview, use_cache, False)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+            stores[i] = store
+    
+    if not misses:
+        return results
+    
+    # 2. 未命中的文件分组调用 LLM
+    batch_size = max(1, batch_size)
+    chunks = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
     
-    results = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_file = {
-            executor.submit(analyze_file, text, filename): (text, filename)
-            for text, filename in files
-        }
+        futures = [
+            executor.submit(
+                _analyze_chunk,
+                [(files[i][0], files[i][1], stores[i]) for i in chunk],
+                max_preview
+            )
+            for chunk in chunks
+        ]
         
-        for future in as_completed(future_to_file):
-            text, filename = future_to_file[future]
+        for chunk, future in zip(chunks, futures):
             try:
-                result = future.result()
-                results.append(result)
+                chunk_results = future.result()
             except Exception as e:
-                print(f"[ERROR] 处理文件 {filename} 失败: {e}")
-                # 添加一个 fallback 结果
-                results.append(FileAnalysis(
-                    category="default",
-                    confidence=0.2,
-                    extracted_date=None,
-                    extracted_amount=None,
-                    vendor_or_party=None,
-                    title=filename,
-                    suggested_filename=f"[其他]_{filename}",
-                    rationale=f"批量处理失败: {str(e)[:100]}",
-                    metadata={}
-                ))
+                # 仅在 DEBUG 级别附带堆栈
+                logger.error(
+                    "批量处理 %d 个文件失败: %s", len(chunk), e,
+                    exc_info=logger.isEnabledFor(logging.DEBUG)
+                )
+                # 为该分组的每个文件添加 fallback 结果
+                chunk_results = [
+                    _fallback_analysis(files[i][1], 0.2, f"批量处理失败: {str(e)[:100]}")
+                    for i in chunk
+                ]
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+    
+    return results
+
+
+# ==================== Batch API（离线批量分析） ====================
+
+
+# Batch 任务的终止状态
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _get_openai_client():
+    """获取 OpenAI SDK 客户端（Batch API 需要直接使用 SDK，配置与文本 LLM 相同）"""
+    from openai import OpenAI
+    
+    _, api_base, api_key, _ = _llm_config()
+    return OpenAI(api_key=api_key, base_url=api_base or None)
+
+
+def submit_batch_analysis(
+    files: list[tuple[str, str, str]],
+    max_preview: int = 1000,
+    client=None
+) -> str:
+    """
+    提交离线批量分析任务（OpenAI Batch API，费用约为同步调用的一半）
+    
+    Args:
+        files: (custom_id, text, filename) 元组列表，custom_id 通常为文件哈希
+        max_preview: 每个文件的最大预览字符数
+        client: 可选的 OpenAI 客户端（为 None 时自动创建）
+    
+    Returns:
+        Batch 任务 ID
+    """
+    import io
+    
+    client = client or _get_openai_client()
+    model, _, _, temperature = _llm_config()
+    response_format = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "FileAnalysis",
+            "schema": FileAnalysis.model_json_schema()
+        }
+    }
+    
+    # 每个文件一行请求
+    lines = []
+    for custom_id, text, filename in files:
+        lines.append(_jsonl_dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": temperature,
+                "response_format": response_format,
+                "messages": [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": _build_user_prompt(text, filename, max_preview)}
+                ]
+            }
+        }))
+    
+    payload = b"\n".join(lines) + b"\n"
+    input_file = client.files.create(
+        file=("batch_input.jsonl", io.BytesIO(payload)),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info("已提交 Batch 任务: %s | 文件数=%d", batch.id, len(files))
+    return batch.id
+
+
+def _jsonl_dumps(obj: Dict[str, Any]) -> bytes:
+    """序列化为一行 UTF-8 JSON（优先使用 orjson，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def collect_batch_analysis(
+    batch_id: str,
+    filenames: Optional[Dict[str, str]] = None,
+    client=None
+) -> Optional[Dict[str, FileAnalysis]]:
+    """
+    获取离线批量分析结果
+    
+    Args:
+        batch_id: submit_batch_analysis 返回的任务 ID
+        filenames: 可选的 custom_id -> 文件名映射（用于生成 fallback 结果）
+        client: 可选的 OpenAI 客户端（为 None 时自动创建）
+    
+    Returns:
+        custom_id -> FileAnalysis 字典；任务尚未结束时返回 None
+    
+    Raises:
+        RuntimeError: 任务失败、过期或被取消时抛出
+    """
+    client = client or _get_openai_client()
+    filenames = filenames or {}
+    
+    batch = client.batches.retrieve(batch_id)
+    if batch.status not in BATCH_TERMINAL_STATUSES:
+        return None
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch 任务 {batch_id} 未完成: {batch.status}")
+    
+    results: Dict[str, FileAnalysis] = {}
+    content = client.files.content(batch.output_file_id).read()
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line) if orjson is not None else json.loads(line)
+        custom_id = record.get("custom_id")
+        filename = filenames.get(custom_id, custom_id)
+        try:
+            body = record["response"]["body"]
+            message = body["choices"][0]["message"]["content"]
+            results[custom_id] = FileAnalysis.from_llm_json(message)
+        except Exception as e:
+            error = record.get("error") or e
+            results[custom_id] = _fallback_analysis(
+                filename, 0.2, f"Batch 结果解析失败: {str(error)[:100]}"
+            )
+    
+    # 输出文件中缺失的请求（写入 error_file）统一回退
+    for custom_id, filename in filenames.items():
+        if custom_id not in results:
+            results[custom_id] = _fallback_analysis(filename, 0.2, "Batch 请求失败")
     
     return results
 
@@ -212,6 +764,112 @@ def analyze_file_batch(files: list[tuple[str, str]], max_workers: int = 3) -> li
 # ==================== 视觉 LLM 分析功能 ====================
 
 
+def _pdf_page_count(pdf_path: Path) -> int:
+    """获取 PDF 页数（优先 pypdfium2，回退到 pdf2image 的 pdfinfo）"""
+    pdfium = _get_pdfium()
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(str(pdf_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(str(pdf_path)).get("Pages", 0))
+
+
+def _render_page_jpeg(
+    pdf_path: str,
+    page_index: int,
+    dpi: int,
+    max_dim: int,
+    grayscale: bool
+) -> bytes:
+    """
+    渲染 PDF 单页并编码为 JPEG 字节（在渲染线程池/进程池中执行）
+    
+    优先使用 pypdfium2 在进程内渲染；未安装时回退到 pdf2image（调用 poppler 的 pdftoppm）
+    """
+    pdfium = _get_pdfium()
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page = pdf[page_index]
+            try:
+                image = page.render(scale=dpi / 72).to_pil()
+            finally:
+                page.close()
+        finally:
+            pdf.close()
+    else:
+        from pdf2image import convert_from_path
+        image = convert_from_path(
+            pdf_path, dpi=dpi, first_page=page_index + 1, last_page=page_index + 1
+        )[0]
+    
+    try:
+        return _encode_page_jpeg(image, max_dim, grayscale)
+    finally:
+        image.close()
+
+
+_render_executor: Optional[Executor] = None
+_render_executor_lock = threading.Lock()
+
+
+def _get_render_executor() -> Executor:
+    """
+    获取常驻的页面渲染执行器（首次调用时创建，避免每次启动 worker）
+    
+    PDFium 不支持多线程并发渲染，pypdfium2 可用时使用进程池；
+    pdf2image 的渲染在 pdftoppm 子进程中完成，线程池即可并行。
+    """
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            workers = min(4, os.cpu_count() or 1)
+            if _get_pdfium() is not None:
+                _render_executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _render_executor = ThreadPoolExecutor(max_workers=workers)
+    return _render_executor
+
+
+# 平均饱和度低于该值的页面视为无彩色（白底黑字）
+_GRAYSCALE_MAX_SATURATION = 8
+
+
+def _encode_page_jpeg(image: Any, max_dim: int, grayscale: bool = True) -> bytes:
+    """
+    将页面图片缩放并编码为 JPEG
+    
+    视觉模型按固定尺寸切块，超出 max_dim 的像素只会增加上传体积和 token 消耗。
+    
+    Args:
+        image: PIL 图片（会被原地缩放）
+        max_dim: 最长边上限（像素）
+        grayscale: 近似无彩色时是否转为灰度
+    
+    Returns:
+        JPEG 字节
+    """
+    import io
+    from PIL import Image, ImageStat
+    
+    image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if grayscale:
+        saturation = ImageStat.Stat(image.convert("HSV").getchannel("S")).mean[0]
+        if saturation < _GRAYSCALE_MAX_SATURATION:
+            image = image.convert("L")
+    
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
 async def analyze_scanned_pdf_with_vision(
     pdf_path: Path,
     llm_instance: Optional[ChatOpenAI] = None,
@@ -249,50 +907,50 @@ async def analyze_scanned_pdf_with_vision(
     
     try:
         # 1. 导入依赖
-        from pdf2image import convert_from_path
-        from PIL import Image
-        import io
         from config.ocr_config import OCR_CONFIG
         
         # 2. 获取 Vision LLM 实例
         if llm_instance is None:
             llm_instance = get_vision_llm_client()
         
-        # 3. 转换 PDF 为图片
+        # 3. 获取页数
         try:
-            images = convert_from_path(
-                str(pdf_path),
-                dpi=dpi,
-                first_page=1,
-                last_page=min(max_pages, 999)
-            )
-            result["pages_analyzed"] = len(images)
+            page_count = min(max_pages, _pdf_page_count(pdf_path), 999)
+        except ImportError:
+            raise
         except Exception as e:
             result["error"] = f"PDF 转图片失败: {str(e)}"
             logger.error(result["error"])
             return result
         
-        # 4. 转换图片为 base64
+        # 4. 并行渲染各页并编码为 JPEG，按页码顺序收集
+        executor = _get_render_executor()
+        futures = [
+            executor.submit(
+                _render_page_jpeg, str(pdf_path), i, dpi,
+                OCR_CONFIG.vision_max_dim, OCR_CONFIG.vision_grayscale
+            )
+            for i in range(page_count)
+        ]
         image_contents = []
-        for idx, image in enumerate(images, 1):
+        for idx, future in enumerate(futures, 1):
             try:
-                # 转换为 JPEG 格式并编码为 base64
-                buffer = io.BytesIO()
-                image.save(buffer, format="JPEG", quality=85)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                
-                image_contents.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64}"
-                    }
-                })
-                
-                logger.debug(f"处理第 {idx}/{len(images)} 页，图片大小: {len(img_base64)} bytes")
-                
+                jpeg = await asyncio.wrap_future(future)
+            except ImportError:
+                raise
             except Exception as e:
                 logger.warning(f"处理第 {idx} 页图片失败: {e}")
                 continue
+            result["pages_analyzed"] += 1
+            
+            image_contents.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('ascii')}"
+                }
+            })
+            
+            logger.debug(f"处理第 {idx}/{page_count} 页，图片大小: {len(jpeg)} bytes")
         
         if not image_contents:
             result["error"] = "没有可用的图片"
@@ -306,11 +964,14 @@ async def analyze_scanned_pdf_with_vision(
             }
         ] + image_contents
         
+        from langchain_core.messages import HumanMessage
+        
         message = HumanMessage(content=content)
         
         # 6. 调用 Vision LLM
         try:
-            response = await llm_instance.ainvoke([message])
+            async with get_rate_limiter():
+                response = await llm_instance.ainvoke([message])
             result["text"] = response.content
             
             # 尝试获取 token 使用情况
@@ -341,6 +1002,29 @@ async def analyze_scanned_pdf_with_vision(
     return result
 
 
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取常驻后台事件循环（首次调用时在守护线程中启动）
+    
+    同步调用方共用这一个循环，缓存的 LLM 客户端的异步连接池可以跨调用复用。
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever,
+                name="llm-event-loop",
+                daemon=True
+            ).start()
+            _background_loop = loop
+    return _background_loop
+
+
 def analyze_scanned_pdf_with_vision_sync(
     pdf_path: Path,
     llm_instance: Optional[ChatOpenAI] = None,
@@ -351,30 +1035,10 @@ def analyze_scanned_pdf_with_vision_sync(
     使用 Vision LLM 分析扫描 PDF（同步版本）
     
     这是 analyze_scanned_pdf_with_vision 的同步包装器，
-    适用于不支持 async/await 的场景。
+    适用于不支持 async/await 的场景。协程提交到常驻后台事件循环执行。
     """
-    import asyncio
-    
-    # 尝试获取当前事件循环
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，创建新的事件循环
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                future = pool.submit(
-                    asyncio.run,
-                    analyze_scanned_pdf_with_vision(pdf_path, llm_instance, max_pages, dpi)
-                )
-                return future.result()
-        else:
-            # 事件循环未运行，直接运行
-            return loop.run_until_complete(
-                analyze_scanned_pdf_with_vision(pdf_path, llm_instance, max_pages, dpi)
-            )
-    except RuntimeError:
-        # 没有事件循环，创建新的
-        return asyncio.run(
-            analyze_scanned_pdf_with_vision(pdf_path, llm_instance, max_pages, dpi)
-        )
-
+    future = asyncio.run_coroutine_threadsafe(
+        analyze_scanned_pdf_with_vision(pdf_path, llm_instance, max_pages, dpi),
+        _get_background_loop()
+    )
+    return future.result()
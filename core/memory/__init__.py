@@ -3,11 +3,12 @@ Memory 模块 - 审批日志和偏好学习
 """
 
 from .database import MemoryDatabase
-from .repository import ApprovalRepository, PreferenceRepository
+from .repository import ApprovalRepository, PreferenceRepository, LLMCacheRepository
 
 __all__ = [
     'MemoryDatabase',
     'ApprovalRepository',
-    'PreferenceRepository'
+    'PreferenceRepository',
+    'LLMCacheRepository'
 ]
 
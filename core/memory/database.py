@@ -4,18 +4,40 @@
 """
 
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, Boolean, 
-    DateTime, Text, ForeignKey, Index
+    create_engine, event, inspect, func, select, exists, literal, and_, or_, false, Column, Integer, String, Float, Boolean, 
+    DateTime, Text, ForeignKey, Index, text
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import json
 import logging
+import threading
+
+# 可选：orjson（C 实现，解析/序列化更快），未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+
+def json_loads(data):
+    """解析 JSON（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, sort_keys: bool = False) -> str:
+    """序列化 JSON 为字符串（优先使用 orjson，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode('utf-8')
+    return json.dumps(obj, sort_keys=sort_keys, ensure_ascii=False)
+
 Base = declarative_base()
 
 
@@ -57,32 +79,29 @@ class ApprovalLog(Base):
     extraction_method = Column(String)
     operator = Column(String)
     
+    __table_args__ = (
+        # 历史页筛选：ORDER BY created_at DESC LIMIT N 反向扫描索引，doc_type/vendor 在索引内过滤
+        Index('ix_approval_created_desc_doctype', 'created_at', 'doc_type', 'vendor'),
+        # Top vendors 聚合：部分覆盖索引，跳过 vendor 为空的记录
+        Index(
+            'ix_approval_vendor_notnull', 'vendor', 'created_at',
+            sqlite_where=text('vendor IS NOT NULL'),
+            postgresql_where=text('vendor IS NOT NULL')
+        ),
+        # action_breakdown / 按 action 筛选
+        Index('ix_approval_action_time', 'action', 'created_at'),
+    )
+    
     def to_dict(self):
         """转为字典（用于 API 返回）"""
-        return {
-            'id': self.id,
-            'session_id': self.session_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'file_hash': self.file_hash,
-            'original_filename': self.original_filename,
-            'original_path': self.original_path,
-            'file_size_bytes': self.file_size_bytes,
-            'doc_type': self.doc_type,
-            'vendor': self.vendor,
-            'extracted_date': self.extracted_date,
-            'confidence_score': self.confidence_score,
-            'suggested_filename': self.suggested_filename,
-            'suggested_folder': self.suggested_folder,
-            'final_filename': self.final_filename,
-            'final_folder': self.final_folder,
-            'action': self.action,
-            'user_modified_filename': self.user_modified_filename,
-            'user_modified_folder': self.user_modified_folder,
-            'modification_reason': self.modification_reason,
-            'processing_time_ms': self.processing_time_ms,
-            'extraction_method': self.extraction_method,
-            'operator': self.operator
-        }
+        data = {key: getattr(self, key) for key in APPROVAL_LOG_COLUMNS}
+        if data['created_at'] is not None:
+            data['created_at'] = data['created_at'].isoformat()
+        return data
+
+
+# ApprovalLog 的全部列名（按定义顺序，建表后计算一次）
+APPROVAL_LOG_COLUMNS = tuple(column.key for column in ApprovalLog.__table__.columns)
 
 
 class LearnedPreference(Base):
@@ -114,24 +133,66 @@ class LearnedPreference(Base):
     
     # 索引
     __table_args__ = (
-        Index('idx_preference_lookup', 'preference_type', 'trigger_vendor', 'trigger_doc_type'),
+        Index('idx_preference_lookup', 'preference_type', 'trigger_vendor', 'trigger_doc_type', 'enabled'),
+        # 每个 (类型, vendor, doc_type) 只允许一条偏好，防止 UI 与 watcher 并发学习时重复创建
+        Index('uq_preference_key', 'preference_type', 'trigger_vendor', 'trigger_doc_type', unique=True),
     )
     
+    @property
+    def trigger_conditions_dict(self) -> dict:
+        """
+        解析后的触发条件
+        
+        按原始 JSON 字符串缓存在实例上：字符串未变化时直接复用，被修改或重新加载后自动重新解析
+        """
+        raw = self.trigger_conditions
+        cached = self.__dict__.get('_trigger_conditions_cache')
+        if cached is None or cached[0] is not raw:
+            try:
+                parsed = json_loads(raw)
+            except (ValueError, TypeError):
+                parsed = {}
+            cached = (raw, parsed)
+            self.__dict__['_trigger_conditions_cache'] = cached
+        return cached[1]
+    
     def get_trigger_conditions_dict(self):
         """解析触发条件为字典"""
-        try:
-            return json.loads(self.trigger_conditions)
-        except (json.JSONDecodeError, TypeError):
-            return {}
+        return self.trigger_conditions_dict
     
     def matches(self, context: dict) -> bool:
         """检查给定上下文是否匹配该偏好"""
-        conditions = self.get_trigger_conditions_dict()
+        conditions = self.trigger_conditions_dict
         return all(
             context.get(key) == value 
             for key, value in conditions.items()
             if value is not None
         )
+    
+    @classmethod
+    def matches_clause(cls, context: dict):
+        """
+        matches() 的 SQL 版本（用于查询过滤）
+        
+        通过 json_each 展开 trigger_conditions：不存在与 context 不一致的非空条件即为匹配，
+        不匹配的行不会被加载到 Python 中。
+        """
+        json_each = func.json_each(cls.trigger_conditions).table_valued("key", "value")
+        satisfied = or_(false(), *[
+            and_(json_each.c.key == key, json_each.c.value == value)
+            for key, value in context.items()
+            if value is not None
+        ])
+        mismatch = select(literal(1)).select_from(json_each).where(
+            json_each.c.value.isnot(None),
+            ~satisfied
+        )
+        return and_(
+            # 先用独立字段（有索引）缩小范围
+            or_(cls.trigger_vendor.is_(None), cls.trigger_vendor == context.get('vendor')),
+            or_(cls.trigger_doc_type.is_(None), cls.trigger_doc_type == context.get('doc_type')),
+            ~exists(mismatch)
+        )
 
 
 class PreferenceAuditLog(Base):
@@ -149,6 +210,64 @@ class PreferenceAuditLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
 
+class LLMCache(Base):
+    """LLM 分析结果缓存表 - 按 (预览文本, 文件名, 模型) 的哈希缓存 FileAnalysis"""
+    __tablename__ = 'llm_cache'
+    
+    cache_key = Column(String, primary_key=True)
+    model = Column(String)
+    result_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# 每个新连接执行的 SQLite PRAGMA
+# - journal_mode=WAL: 读写互不阻塞（UI 读取与 watcher 写入可并发）
+# - synchronous=NORMAL: WAL 下只在 checkpoint 时 fsync
+# - temp_store=MEMORY: 临时表/排序放在内存
+# - mmap_size=256MB: 通过 mmap 读取页面，减少 pread 调用
+# - cache_size=-65536: 页缓存 64MB（负数表示 KB）
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """新连接的 SQLite PRAGMA 设置（除 journal_mode 外均为连接级设置）"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+# vendor / 文件名子串搜索用的 FTS5 外部内容表（trigram 分词支持任意位置子串匹配）
+# 由触发器与 approval_logs 保持同步
+APPROVAL_FTS_TABLE = 'approval_log_fts'
+APPROVAL_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {APPROVAL_FTS_TABLE} USING fts5(
+        vendor, original_filename,
+        content='approval_logs', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS approval_logs_fts_ai AFTER INSERT ON approval_logs BEGIN
+        INSERT INTO {APPROVAL_FTS_TABLE}(rowid, vendor, original_filename)
+        VALUES (new.id, new.vendor, new.original_filename);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS approval_logs_fts_ad AFTER DELETE ON approval_logs BEGIN
+        INSERT INTO {APPROVAL_FTS_TABLE}({APPROVAL_FTS_TABLE}, rowid, vendor, original_filename)
+        VALUES ('delete', old.id, old.vendor, old.original_filename);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS approval_logs_fts_au AFTER UPDATE ON approval_logs BEGIN
+        INSERT INTO {APPROVAL_FTS_TABLE}({APPROVAL_FTS_TABLE}, rowid, vendor, original_filename)
+        VALUES ('delete', old.id, old.vendor, old.original_filename);
+        INSERT INTO {APPROVAL_FTS_TABLE}(rowid, vendor, original_filename)
+        VALUES (new.id, new.vendor, new.original_filename);
+    END""",
+]
+
+
 class MemoryDatabase:
     """数据库管理器"""
     
@@ -169,22 +288,134 @@ class MemoryDatabase:
         self.db_path = db_path
         self.engine = create_engine(
             f'sqlite:///{db_path}',
-            echo=False  # 设为 True 可以看到 SQL 语句
+            echo=False,  # 设为 True 可以看到 SQL 语句
+            # UI、watcher、后台写入线程各自持有会话，池大小按并发线程数留足余量
+            pool_size=10,
+            max_overflow=20,
+            connect_args={
+                # 连接由连接池在线程间复用，每个线程同一时刻只使用自己的会话
+                "check_same_thread": False,
+                # sqlite3 每个连接缓存的预编译语句数（默认 128），重复查询免去重新解析 SQL
+                "cached_statements": 512,
+            }
         )
+        event.listen(self.engine, "connect", _set_sqlite_pragmas)
         
         # 创建所有表
         Base.metadata.create_all(self.engine)
+        self._ensure_indexes()
+        self.fts_enabled = self._ensure_fts()
         
-        # 创建会话工厂
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        # 创建线程本地会话（scoped_session 按线程分配独立的 Session，可跨线程共享本对象）
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        # 每个线程的显式事务状态（见 transaction()）
+        self._tx_state = threading.local()
         
         logger.info(f"Memory database initialized at: {db_path}")
     
+    def _ensure_indexes(self):
+        """
+        为已存在的表补建新增索引
+        
+        create_all 只在建表时创建索引，旧数据库需要单独补建；
+        定义已变更的同名索引会先删除再重建。
+        """
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            existing = {
+                idx['name']: idx['column_names']
+                for idx in inspector.get_indexes(table.name)
+            }
+            for index in table.indexes:
+                columns = [col.name for col in index.columns]
+                if existing.get(index.name) == columns:
+                    continue
+                if index.name in existing:
+                    index.drop(bind=self.engine)
+                try:
+                    index.create(bind=self.engine)
+                except Exception as e:
+                    # 旧数据违反唯一约束时跳过，不影响启动
+                    logger.warning(f"Failed to create index {index.name} on {table.name}: {e}")
+                    continue
+                logger.info(f"Created index {index.name} on {table.name}")
+    
+    def _ensure_fts(self) -> bool:
+        """
+        创建 vendor 子串搜索用的 FTS5 表和同步触发器
+        
+        返回: 是否可用（SQLite 未编译 FTS5 或版本过旧不支持 trigram 时为 False，查询回退到 LIKE）
+        """
+        try:
+            is_new = not inspect(self.engine).has_table(APPROVAL_FTS_TABLE)
+            with self.engine.begin() as conn:
+                for ddl in APPROVAL_FTS_DDL:
+                    conn.exec_driver_sql(ddl)
+                if is_new:
+                    # 为已有记录建立索引
+                    conn.exec_driver_sql(
+                        f"INSERT INTO {APPROVAL_FTS_TABLE}({APPROVAL_FTS_TABLE}) VALUES ('rebuild')"
+                    )
+            return True
+        except Exception as e:
+            logger.warning(f"FTS5 unavailable, vendor search falls back to LIKE: {e}")
+            return False
+    
+    @contextmanager
+    def transaction(self):
+        """
+        把多次仓库操作合并为一个事务（一次提交、一次 fsync）
+        
+        块内仓库方法只 flush 不提交，退出时由最外层统一提交；可嵌套。
+        块内任一操作失败回滚后，整个事务作废，退出时抛出异常。
+        
+        示例:
+            with db.transaction():
+                for log_data in logs:
+                    repo.save_approval(log_data)
+        """
+        state = self._tx_state
+        depth = getattr(state, 'depth', 0)
+        if depth == 0:
+            state.rolled_back = False
+        state.depth = depth + 1
+        try:
+            yield self.session
+        except Exception:
+            if depth == 0:
+                self.session.rollback()
+            raise
+        finally:
+            state.depth = depth
+        
+        if depth == 0:
+            if state.rolled_back:
+                # 丢弃失败操作之后块内 flush 的写入，避免被下一次无关的 commit() 提交
+                self.session.rollback()
+                raise RuntimeError("Transaction was rolled back by a failed operation")
+            self.session.commit()
+    
+    def in_transaction(self) -> bool:
+        """当前线程是否处于 transaction() 块内"""
+        return bool(getattr(self._tx_state, 'depth', 0))
+    
+    def commit(self):
+        """提交当前线程的会话；处于 transaction() 块内时只 flush，由最外层提交"""
+        if self.in_transaction():
+            self.session.flush()
+        else:
+            self.session.commit()
+    
+    def rollback(self):
+        """回滚当前线程的会话；处于 transaction() 块内时同时标记整个事务作废"""
+        if self.in_transaction():
+            self._tx_state.rolled_back = True
+        self.session.rollback()
+    
     def close(self):
-        """关闭数据库连接"""
+        """关闭当前线程的会话"""
         if self.session:
-            self.session.close()
+            self.session.remove()
     
     def __enter__(self):
         """支持 with 语句"""
@@ -3,14 +3,22 @@
 """
 
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func, desc
-import json
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from sqlalchemy import (
+    and_, or_, func, desc, insert, tuple_, select, case, literal, union_all,
+    text, column, Integer
+)
+from sqlalchemy.exc import IntegrityError
+import queue
+import threading
+import time
+import weakref
 import logging
 
 from .database import (
-    MemoryDatabase, ApprovalLog, LearnedPreference, 
-    PreferenceAuditLog
+    MemoryDatabase, ApprovalLog, APPROVAL_LOG_COLUMNS, LearnedPreference, 
+    PreferenceAuditLog, LLMCache, APPROVAL_FTS_TABLE, json_loads, json_dumps
 )
 
 logger = logging.getLogger(__name__)
@@ -19,8 +27,103 @@ logger = logging.getLogger(__name__)
 class ApprovalRepository:
     """审批日志仓库"""
     
+    # 写入线程的停止信号
+    _STOP = object()
+    
     def __init__(self, db: MemoryDatabase):
         self.db = db
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer_thread: Optional[threading.Thread] = None
+    
+    def transaction(self):
+        """合并多次操作为一个事务，见 MemoryDatabase.transaction"""
+        return self.db.transaction()
+    
+    def start_writer(self, max_batch: int = 100, flush_interval: float = 0.2):
+        """
+        启动后台写入线程（write-behind），重复调用无副作用
+        
+        之后 enqueue_approval 只入队即返回，写入线程每攒满 max_batch 条
+        或等待 flush_interval 秒后，用 save_approvals_bulk 一次性写入。
+        """
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        
+        self._write_queue = queue.Queue()
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop,
+            args=(self._write_queue, max_batch, flush_interval),
+            name="approval-writer",
+            daemon=True
+        )
+        self._writer_thread.start()
+    
+    def stop_writer(self, timeout: Optional[float] = None):
+        """写完队列中剩余的记录后停止写入线程"""
+        thread = self._writer_thread
+        if thread is None:
+            return
+        
+        self._write_queue.put(self._STOP)
+        thread.join(timeout)
+        self._writer_thread = None
+    
+    def enqueue_approval(self, log_data: dict) -> Future:
+        """
+        异步保存审批记录
+        
+        返回: Future，完成后结果为新记录的 ID；写入线程未启动时同步保存
+        """
+        future = Future()
+        if self._writer_thread is None:
+            try:
+                future.set_result(self.save_approval(log_data))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        
+        self._write_queue.put((log_data, future))
+        return future
+    
+    def _writer_loop(self, write_queue: queue.Queue, max_batch: int, flush_interval: float):
+        """写入线程主循环：攒批后批量写入"""
+        stopping = False
+        try:
+            while not stopping:
+                item = write_queue.get()
+                if item is self._STOP:
+                    break
+                
+                batch = [item]
+                deadline = time.monotonic() + flush_interval
+                while len(batch) < max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = write_queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                
+                try:
+                    ids = self.save_approvals_bulk([log_data for log_data, _ in batch])
+                except Exception:
+                    # 批量写入失败时逐条重试，避免一条坏记录拖累整批
+                    for log_data, future in batch:
+                        try:
+                            future.set_result(self.save_approval(log_data))
+                        except Exception as e:
+                            future.set_exception(e)
+                else:
+                    for (_, future), log_id in zip(batch, ids):
+                        future.set_result(log_id)
+        finally:
+            # 释放本线程的会话
+            self.db.session.remove()
     
     def save_approval(self, log_data: dict) -> int:
         """
@@ -56,7 +159,7 @@ class ApprovalRepository:
             # 创建日志记录
             log = ApprovalLog(**log_data)
             self.db.session.add(log)
-            self.db.session.commit()
+            self.db.commit()
             
             logger.info(f"Approval saved: {log_data['original_filename']} -> {log_data['action']}")
             
@@ -70,10 +173,85 @@ class ApprovalRepository:
             return log.id
             
         except Exception as e:
-            self.db.session.rollback()
+            self.db.rollback()
             logger.error(f"Failed to save approval: {e}")
             raise
     
+    def save_approvals_bulk(self, log_dicts: List[dict]) -> List[int]:
+        """
+        批量保存审批记录（单个事务，一条 executemany INSERT）
+        
+        参数: save_approval 所用字典的列表
+        
+        返回: 新插入记录的 ID 列表（与输入顺序一致）
+        """
+        if not log_dicts:
+            return []
+        
+        try:
+            ids = list(self.db.session.scalars(
+                insert(ApprovalLog).returning(ApprovalLog.id, sort_by_parameter_order=True),
+                log_dicts
+            ))
+            self.db.commit()
+            
+            logger.info(f"Approvals saved in bulk: {len(ids)} records")
+            
+            # 触发偏好学习：先收集全部更新，再统一写入
+            updates = [
+                update
+                for log_data, log_id in zip(log_dicts, ids)
+                for update in self._learning_updates(log_data, log_id)
+            ]
+            try:
+                self._apply_learning_updates(updates)
+            except Exception as e:
+                logger.error(f"Preference learning failed: {e}")
+                # 学习失败不影响主流程
+            
+            return ids
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to save approvals in bulk: {e}")
+            raise
+    
+    def _filter_approvals(
+        self,
+        query,
+        doc_type: Optional[str] = None,
+        vendor: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        action: Optional[str] = None
+    ):
+        """为审批记录查询附加筛选条件"""
+        if doc_type:
+            query = query.filter(ApprovalLog.doc_type == doc_type)
+        if vendor:
+            query = query.filter(self._vendor_clause(vendor))
+        if date_from:
+            query = query.filter(ApprovalLog.created_at >= date_from)
+        if date_to:
+            query = query.filter(ApprovalLog.created_at <= date_to)
+        if action:
+            query = query.filter(ApprovalLog.action == action)
+        return query
+    
+    def _vendor_clause(self, vendor: str):
+        """
+        vendor 子串匹配条件
+        
+        trigram FTS5 可用且关键字不少于 3 个字符时走全文索引，否则回退到 LIKE
+        """
+        if getattr(self.db, 'fts_enabled', False) and len(vendor) >= 3:
+            phrase = '"' + vendor.replace('"', '""') + '"'
+            fts_ids = text(
+                f"SELECT rowid FROM {APPROVAL_FTS_TABLE} WHERE {APPROVAL_FTS_TABLE} MATCH :fts_query"
+            ).bindparams(fts_query=f'vendor : {phrase}').columns(column('rowid', Integer))
+            return ApprovalLog.id.in_(fts_ids)
+        return ApprovalLog.vendor.like(f'%{vendor}%')
+    
     def get_recent_approvals(
         self, 
         limit: int = 50,
@@ -88,22 +266,43 @@ class ApprovalRepository:
         
         支持按 doc_type, vendor, 日期范围, action 筛选
         """
+        # 按列查询后直接构建字典（字段与 to_dict 一致），不实例化 ORM 对象
+        return self.get_recent_approvals_cols(
+            APPROVAL_LOG_COLUMNS, limit, doc_type, vendor, date_from, date_to, action
+        )
+    
+    def get_recent_approvals_cols(
+        self,
+        cols: List[str],
+        limit: int = 50,
+        doc_type: Optional[str] = None,
+        vendor: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        action: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        获取最近的审批记录（只查询指定列）
+        
+        筛选参数同 get_recent_approvals；返回的字典只包含 cols 中的字段，
+        created_at 转为 ISO 字符串（与 to_dict 一致）
+        """
         try:
-            query = self.db.session.query(ApprovalLog)
-            
-            if doc_type:
-                query = query.filter(ApprovalLog.doc_type == doc_type)
-            if vendor:
-                query = query.filter(ApprovalLog.vendor.like(f'%{vendor}%'))
-            if date_from:
-                query = query.filter(ApprovalLog.created_at >= date_from)
-            if date_to:
-                query = query.filter(ApprovalLog.created_at <= date_to)
-            if action:
-                query = query.filter(ApprovalLog.action == action)
-            
-            results = query.order_by(desc(ApprovalLog.created_at)).limit(limit).all()
-            return [log.to_dict() for log in results]
+            columns = [getattr(ApprovalLog, col) for col in cols]
+            stmt = self._filter_approvals(
+                select(*columns),
+                doc_type, vendor, date_from, date_to, action
+            ).order_by(desc(ApprovalLog.created_at)).limit(limit)
+            
+            # Core 查询返回元组行，分批读取游标
+            rows = self.db.session.execute(stmt.execution_options(yield_per=200))
+            results = []
+            for row in rows:
+                item = dict(zip(cols, row))
+                if item.get('created_at') is not None:
+                    item['created_at'] = item['created_at'].isoformat()
+                results.append(item)
+            return results
             
         except Exception as e:
             logger.error(f"Failed to get recent approvals: {e}")
@@ -126,36 +325,48 @@ class ApprovalRepository:
             # 时间范围
             date_from = datetime.utcnow() - timedelta(days=days)
             
-            # 总数
-            total = self.db.session.query(func.count(ApprovalLog.id)).scalar() or 0
-            
-            # 最近数量
-            recent_count = self.db.session.query(func.count(ApprovalLog.id)) \
-                .filter(ApprovalLog.created_at >= date_from).scalar() or 0
+            # 总数 / 最近数量 / 平均处理时间：一次扫描完成
+            total, recent_count, avg_time = self.db.session.execute(
+                select(
+                    func.count(ApprovalLog.id),
+                    func.sum(case((ApprovalLog.created_at >= date_from, 1), else_=0)),
+                    func.avg(ApprovalLog.processing_time_ms)
+                )
+            ).one()
+            total = total or 0
+            recent_count = recent_count or 0
+            avg_time = avg_time or 0
             
-            # 按 action 统计
-            action_stats = self.db.session.query(
-                ApprovalLog.action,
-                func.count(ApprovalLog.id)
-            ).group_by(ApprovalLog.action).all()
+            # 按 action 统计 + Top vendors (最近 N 天)：UNION ALL 合并为一次查询
+            action_q = select(
+                literal('action').label('kind'),
+                ApprovalLog.action.label('key'),
+                func.count(ApprovalLog.id).label('cnt')
+            ).group_by(ApprovalLog.action)
             
-            # Top vendors (最近 30 天)
-            top_vendors = self.db.session.query(
-                ApprovalLog.vendor,
-                func.count(ApprovalLog.id)
-            ).filter(
+            vendor_q = select(
+                literal('vendor').label('kind'),
+                ApprovalLog.vendor.label('key'),
+                func.count(ApprovalLog.id).label('cnt')
+            ).where(
                 and_(
                     ApprovalLog.vendor.isnot(None),
                     ApprovalLog.created_at >= date_from
                 )
             ).group_by(ApprovalLog.vendor) \
              .order_by(desc(func.count(ApprovalLog.id))) \
-             .limit(10).all()
+             .limit(10).subquery()
             
-            # 平均处理时间
-            avg_time = self.db.session.query(
-                func.avg(ApprovalLog.processing_time_ms)
-            ).scalar() or 0
+            rows = self.db.session.execute(
+                union_all(action_q, select(vendor_q))
+            ).all()
+            
+            action_stats = [(key, cnt) for kind, key, cnt in rows if kind == 'action']
+            top_vendors = sorted(
+                ((key, cnt) for kind, key, cnt in rows if kind == 'vendor'),
+                key=lambda item: item[1],
+                reverse=True
+            )
             
             return {
                 'total_approvals': total,
@@ -175,37 +386,131 @@ class ApprovalRepository:
                 'avg_processing_time_ms': 0
             }
     
+    def get_doc_type_counts(self) -> Dict[str, int]:
+        """
+        按文档类型统计审批数量（SQL 端聚合）
+        
+        返回: {'invoice': 120, 'contract': 45, ...}，按数量降序
+        """
+        try:
+            rows = self.db.session.query(
+                ApprovalLog.doc_type,
+                func.count(ApprovalLog.id)
+            ).filter(
+                ApprovalLog.doc_type.isnot(None)
+            ).group_by(ApprovalLog.doc_type) \
+             .order_by(desc(func.count(ApprovalLog.id))).all()
+            
+            return dict(rows)
+            
+        except Exception as e:
+            logger.error(f"Failed to get doc type counts: {e}")
+            return {}
+    
+    def get_daily_counts(self, days: int = 7) -> Dict[date, int]:
+        """
+        统计最近 N 天每天的审批数量（SQL 端聚合）
+        
+        返回: {date(2025, 1, 1): 12, ...}，没有记录的日期不出现
+        """
+        try:
+            date_from = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+            day = func.date(ApprovalLog.created_at)
+            
+            rows = self.db.session.query(
+                day,
+                func.count(ApprovalLog.id)
+            ).filter(
+                ApprovalLog.created_at >= date_from
+            ).group_by(day).all()
+            
+            return {date.fromisoformat(d): count for d, count in rows if d}
+            
+        except Exception as e:
+            logger.error(f"Failed to get daily counts: {e}")
+            return {}
+    
     def _trigger_preference_learning(self, log: ApprovalLog):
+        """从单条审批记录中学习偏好"""
+        self._apply_learning_updates(self._learning_updates(log.to_dict(), log.id))
+    
+    @staticmethod
+    def _learning_updates(log_data: dict, log_id: int) -> List[tuple]:
         """
-        从审批记录中学习偏好
+        从审批记录中提取需要学习的偏好
         
         学习规则：
         1. 如果用户修改了目录 → 学习 vendor_folder 映射
         2. 如果用户修改了文件名 → 记录（TODO: 命名模式识别）
+        
+        返回: (preference_type, trigger_conditions, preference_value, log_id) 列表
         """
-        pref_repo = PreferenceRepository(self.db)
+        updates = []
         
         # 规则 1: Vendor → Folder 映射
-        if log.user_modified_folder and log.vendor and log.doc_type:
-            try:
-                pref_repo.update_preference(
-                    preference_type='vendor_folder',
-                    trigger_conditions={
-                        'vendor': log.vendor,
-                        'doc_type': log.doc_type
-                    },
-                    preference_value=log.final_folder,
-                    triggered_by_log_id=log.id
-                )
-                logger.info(f"Learned preference: {log.vendor} + {log.doc_type} -> {log.final_folder}")
-            except Exception as e:
-                logger.error(f"Failed to learn vendor_folder preference: {e}")
+        vendor = log_data.get('vendor')
+        doc_type = log_data.get('doc_type')
+        if log_data.get('user_modified_folder') and vendor and doc_type:
+            updates.append((
+                'vendor_folder',
+                {'vendor': vendor, 'doc_type': doc_type},
+                log_data['final_folder'],
+                log_id
+            ))
         
         # 规则 2: Naming Template (TODO: 需要模式识别算法)
         # if log.user_modified_filename:
         #     分析用户命名模式
         #     例如检测是否总是把 "Invoice" 改为 "发票"
         #     pass
+        
+        return updates
+    
+    def _apply_learning_updates(self, updates: List[tuple]):
+        """写入学习到的偏好（一次批量更新）"""
+        if not updates:
+            return
+        
+        try:
+            PreferenceRepository(self.db).update_preferences_bulk(updates)
+            for _, conditions, value, _ in updates:
+                logger.info(f"Learned preference: {conditions['vendor']} + {conditions['doc_type']} -> {value}")
+        except Exception as e:
+            logger.error(f"Failed to learn preferences: {e}")
+
+
+class _PreferenceSnapshot:
+    """
+    已启用偏好的内存快照（线程安全）
+    
+    结构: {preference_type: {vendor: [(doc_type, value, confidence), ...]}}，
+    每个 vendor 下按置信度降序。本进程内的写入会标记为脏；每次读取还会比对版本号
+    （偏好审计日志的最大 ID），其他进程（如 watcher、CLI 与 UI）修改偏好后立即重新加载。
+    """
+    
+    def __init__(self):
+        self.data = None
+        self.version = None
+        self._lock = threading.Lock()
+    
+    def get(self, loader, version) -> dict:
+        """返回当前快照，已失效或 version() 与加载时不同时调用 loader() 重新加载"""
+        # 先取版本号再加载：两者之间有新写入时，下次读取会再次重新加载
+        current = version()
+        with self._lock:
+            if self.data is None or current != self.version:
+                self.data = loader()
+                self.version = current
+            return self.data
+    
+    def invalidate(self):
+        with self._lock:
+            self.data = None
+
+
+# 每个数据库实例一份快照（仓库对象是按需创建的轻量包装，不能各自持有）
+_preference_snapshots: "weakref.WeakKeyDictionary[MemoryDatabase, _PreferenceSnapshot]" = weakref.WeakKeyDictionary()
+_preference_snapshots_lock = threading.Lock()
 
 
 class PreferenceRepository:
@@ -213,6 +518,15 @@ class PreferenceRepository:
     
     def __init__(self, db: MemoryDatabase):
         self.db = db
+        with _preference_snapshots_lock:
+            snapshot = _preference_snapshots.get(db)
+            if snapshot is None:
+                snapshot = _preference_snapshots[db] = _PreferenceSnapshot()
+        self._snapshot = snapshot
+    
+    def transaction(self):
+        """合并多次操作为一个事务，见 MemoryDatabase.transaction"""
+        return self.db.transaction()
     
     def update_preference(
         self,
@@ -228,85 +542,144 @@ class PreferenceRepository:
         - 新样本与现有偏好一致 → confidence += 0.1 (最高 1.0)
         - 新样本与现有偏好冲突 → confidence -= 0.15，样本多则替换
         """
+        self.update_preferences_bulk([
+            (preference_type, trigger_conditions, preference_value, triggered_by_log_id)
+        ])
+    
+    def update_preferences_bulk(self, updates: List[tuple]):
+        """
+        批量更新或创建偏好（单个事务）
+        
+        一次 tuple IN 查询取出所有涉及的偏好，在内存中按顺序应用增量置信度算法，
+        再统一 flush 偏好行并以一条 executemany 写入审计日志。
+        
+        Args:
+            updates: (preference_type, trigger_conditions, preference_value, triggered_by_log_id) 列表，
+                同一偏好出现多次时按列表顺序依次累积
+        """
+        if not updates:
+            return
+        
+        try:
+            self._write_preference_updates(updates)
+        except IntegrityError:
+            # 其他进程在查询与插入之间创建了同一偏好（唯一约束冲突）：重新读取后再应用一次
+            logger.info("Preference created concurrently, retrying update")
+            self._write_preference_updates(updates)
+    
+    def _write_preference_updates(self, updates: List[tuple]):
+        """
+        update_preferences_bulk 的单次事务
+        
+        处于 transaction() 块内时在 SAVEPOINT 中写入：失败只撤销本次偏好写入，
+        同一事务中已 flush 的审批记录不受影响，外层事务也不会作废。
+        """
+        session = self.db.session
+        savepoint = session.begin_nested() if self.db.in_transaction() else None
         try:
-            # 准备条件
-            conditions_json = json.dumps(trigger_conditions, sort_keys=True, ensure_ascii=False)
-            trigger_vendor = trigger_conditions.get('vendor')
-            trigger_doc_type = trigger_conditions.get('doc_type')
+            keys = {
+                (preference_type, conditions.get('vendor'), conditions.get('doc_type'))
+                for preference_type, conditions, _, _ in updates
+            }
             
-            # 查找现有偏好
-            existing = self.db.session.query(LearnedPreference).filter(
-                and_(
-                    LearnedPreference.preference_type == preference_type,
-                    LearnedPreference.trigger_vendor == trigger_vendor,
-                    LearnedPreference.trigger_doc_type == trigger_doc_type
+            # 一次查询取出所有现有偏好
+            existing_by_key = {
+                (pref.preference_type, pref.trigger_vendor, pref.trigger_doc_type): pref
+                for pref in session.query(LearnedPreference).filter(
+                    tuple_(
+                        LearnedPreference.preference_type,
+                        LearnedPreference.trigger_vendor,
+                        LearnedPreference.trigger_doc_type
+                    ).in_(keys)
                 )
-            ).first()
+            }
             
-            if existing:
-                # 更新现有偏好
-                old_value = existing.preference_value
-                old_confidence = existing.confidence
+            # (偏好对象, 审计字段) - 新建偏好的 ID 要等 flush 后才有
+            audits = []
+            # 整批共用同一时间戳
+            now = datetime.utcnow()
+            
+            for preference_type, trigger_conditions, preference_value, triggered_by_log_id in updates:
+                trigger_vendor = trigger_conditions.get('vendor')
+                trigger_doc_type = trigger_conditions.get('doc_type')
+                key = (preference_type, trigger_vendor, trigger_doc_type)
+                existing = existing_by_key.get(key)
                 
-                if existing.preference_value == preference_value:
-                    # 一致 → 增加置信度
-                    existing.confidence = min(1.0, existing.confidence + 0.1)
-                    logger.info(f"Preference reinforced: {trigger_vendor} confidence: {old_confidence:.2f} -> {existing.confidence:.2f}")
-                else:
-                    # 冲突 → 降低置信度
-                    existing.confidence = max(0.1, existing.confidence - 0.15)
+                if existing:
+                    # 更新现有偏好
+                    old_value = existing.preference_value
+                    old_confidence = existing.confidence
                     
-                    # 如果新样本多次出现，替换旧值
-                    if existing.sample_count >= 3:
-                        existing.preference_value = preference_value
-                        logger.info(f"Preference updated: {trigger_vendor} value changed: {old_value} -> {preference_value}")
-                
-                existing.sample_count += 1
-                existing.last_seen = datetime.utcnow()
+                    if existing.preference_value == preference_value:
+                        # 一致 → 增加置信度
+                        existing.confidence = min(1.0, existing.confidence + 0.1)
+                        logger.info(f"Preference reinforced: {trigger_vendor} confidence: {old_confidence:.2f} -> {existing.confidence:.2f}")
+                    else:
+                        # 冲突 → 降低置信度
+                        existing.confidence = max(0.1, existing.confidence - 0.15)
+                        
+                        # 如果新样本多次出现，替换旧值
+                        if existing.sample_count >= 3:
+                            existing.preference_value = preference_value
+                            logger.info(f"Preference updated: {trigger_vendor} value changed: {old_value} -> {preference_value}")
+                    
+                    existing.sample_count += 1
+                    existing.last_seen = now
+                    
+                    audits.append((existing, {
+                        'action': 'updated',
+                        'old_value': old_value,
+                        'new_value': existing.preference_value,
+                        'old_confidence': old_confidence,
+                        'new_confidence': existing.confidence,
+                        'triggered_by_log_id': triggered_by_log_id
+                    }))
                 
-                # 记录审计日志
-                audit = PreferenceAuditLog(
-                    preference_id=existing.id,
-                    action='updated',
-                    old_value=old_value,
-                    new_value=existing.preference_value,
-                    old_confidence=old_confidence,
-                    new_confidence=existing.confidence,
-                    triggered_by_log_id=triggered_by_log_id
-                )
-                self.db.session.add(audit)
+                else:
+                    # 创建新偏好
+                    new_pref = LearnedPreference(
+                        preference_type=preference_type,
+                        trigger_vendor=trigger_vendor,
+                        trigger_doc_type=trigger_doc_type,
+                        trigger_conditions=json_dumps(trigger_conditions, sort_keys=True),
+                        preference_value=preference_value,
+                        confidence=0.6,  # 初始置信度
+                        sample_count=1,
+                        last_seen=now,
+                        created_at=now
+                    )
+                    session.add(new_pref)
+                    existing_by_key[key] = new_pref
+                    
+                    audits.append((new_pref, {
+                        'action': 'created',
+                        'new_value': preference_value,
+                        'new_confidence': 0.6,
+                        'triggered_by_log_id': triggered_by_log_id
+                    }))
+                    
+                    logger.info(f"New preference created: {preference_type} - {trigger_conditions}")
             
-            else:
-                # 创建新偏好
-                new_pref = LearnedPreference(
-                    preference_type=preference_type,
-                    trigger_vendor=trigger_vendor,
-                    trigger_doc_type=trigger_doc_type,
-                    trigger_conditions=conditions_json,
-                    preference_value=preference_value,
-                    confidence=0.6,  # 初始置信度
-                    sample_count=1
-                )
-                self.db.session.add(new_pref)
-                self.db.session.flush()  # 获取 ID
-                
-                # 记录审计日志
-                audit = PreferenceAuditLog(
-                    preference_id=new_pref.id,
-                    action='created',
-                    new_value=preference_value,
-                    new_confidence=0.6,
-                    triggered_by_log_id=triggered_by_log_id
-                )
-                self.db.session.add(audit)
-                
-                logger.info(f"New preference created: {preference_type} - {trigger_conditions}")
+            session.flush()  # 写入偏好并获取新建偏好的 ID
             
-            self.db.session.commit()
+            # 记录审计日志
+            session.execute(
+                insert(PreferenceAuditLog),
+                [dict(fields, preference_id=pref.id, timestamp=now) for pref, fields in audits]
+            )
+            
+            if savepoint is not None:
+                savepoint.commit()
+            self.db.commit()
+            self._snapshot.invalidate()
             
         except Exception as e:
-            self.db.session.rollback()
-            logger.error(f"Failed to update preference: {e}")
+            if savepoint is not None:
+                savepoint.rollback()
+            else:
+                self.db.rollback()
+            if not isinstance(e, IntegrityError):
+                logger.error(f"Failed to update preferences: {e}")
             raise
     
     def get_preference(
@@ -326,46 +699,73 @@ class PreferenceRepository:
         返回: 偏好值（如目标文件夹路径）或 None
         """
         try:
-            # 基础查询
-            query = self.db.session.query(LearnedPreference).filter(
-                and_(
-                    LearnedPreference.preference_type == preference_type,
-                    LearnedPreference.enabled == True,
-                    LearnedPreference.confidence >= min_confidence
-                )
-            )
-            
-            # 优先查找精确匹配
-            vendor = context.get('vendor')
-            doc_type = context.get('doc_type')
-            
-            if vendor and doc_type:
-                exact_match = query.filter(
-                    and_(
-                        LearnedPreference.trigger_vendor == vendor,
-                        LearnedPreference.trigger_doc_type == doc_type
-                    )
-                ).order_by(desc(LearnedPreference.confidence)).first()
-                
-                if exact_match:
-                    logger.info(f"Found exact preference match: {vendor} + {doc_type} -> {exact_match.preference_value}")
-                    return exact_match.preference_value
-            
-            # 如果没有精确匹配，尝试 vendor-only 匹配
-            if vendor:
-                vendor_match = query.filter(
-                    LearnedPreference.trigger_vendor == vendor
-                ).order_by(desc(LearnedPreference.confidence)).first()
-                
-                if vendor_match:
-                    logger.info(f"Found vendor preference match: {vendor} -> {vendor_match.preference_value}")
-                    return vendor_match.preference_value
-            
-            return None
-            
+            by_vendor = self.snapshot().get(preference_type, {})
         except Exception as e:
             logger.error(f"Failed to get preference: {e}")
             return None
+        
+        vendor = context.get('vendor')
+        doc_type = context.get('doc_type')
+        if not vendor:
+            return None
+        
+        # 候选已按置信度降序
+        candidates = [c for c in by_vendor.get(vendor, ()) if c[2] >= min_confidence]
+        
+        # 优先查找精确匹配
+        if doc_type:
+            for trigger_doc_type, value, _ in candidates:
+                if trigger_doc_type == doc_type:
+                    logger.info(f"Found exact preference match: {vendor} + {doc_type} -> {value}")
+                    return value
+        
+        # 如果没有精确匹配，尝试 vendor-only 匹配
+        if candidates:
+            value = candidates[0][1]
+            logger.info(f"Found vendor preference match: {vendor} -> {value}")
+            return value
+        
+        return None
+    
+    def snapshot(self) -> Dict[str, Dict[str, List[tuple]]]:
+        """
+        获取已启用偏好的内存快照（一次查询加载，写入后自动刷新）
+        
+        返回: {preference_type: {vendor: [(doc_type, value, confidence), ...]}}，按置信度降序
+        """
+        if self.db.in_transaction():
+            # 事务块内可能读到尚未提交的写入，不放入共享快照
+            return self._load_snapshot()
+        return self._snapshot.get(self._load_snapshot, self._snapshot_version)
+    
+    def _snapshot_version(self) -> Optional[int]:
+        """
+        偏好版本号：审计日志的最大 ID（主键索引，单次查找）
+        
+        偏好的创建、更新、禁用都在同一事务中写入审计日志，任何进程修改偏好后版本号都会变化
+        """
+        return self.db.session.execute(select(func.max(PreferenceAuditLog.id))).scalar()
+    
+    def _load_snapshot(self) -> Dict[str, Dict[str, List[tuple]]]:
+        """从数据库加载全部已启用偏好"""
+        rows = self.db.session.execute(
+            select(
+                LearnedPreference.preference_type,
+                LearnedPreference.trigger_vendor,
+                LearnedPreference.trigger_doc_type,
+                LearnedPreference.preference_value,
+                LearnedPreference.confidence
+            ).where(
+                LearnedPreference.enabled == True
+            ).order_by(desc(LearnedPreference.confidence))
+        ).all()
+        
+        data: Dict[str, Dict[str, List[tuple]]] = {}
+        for preference_type, vendor, doc_type, value, confidence in rows:
+            data.setdefault(preference_type, {}).setdefault(vendor, []).append(
+                (doc_type, value, confidence)
+            )
+        return data
     
     def list_all_preferences(
         self, 
@@ -385,26 +785,58 @@ class PreferenceRepository:
             
             prefs = query.order_by(desc(LearnedPreference.confidence)).all()
             
-            return [
-                {
-                    'id': p.id,
-                    'type': p.preference_type,
-                    'vendor': p.trigger_vendor,
-                    'doc_type': p.trigger_doc_type,
-                    'conditions': p.get_trigger_conditions_dict(),
-                    'value': p.preference_value,
-                    'confidence': p.confidence,
-                    'sample_count': p.sample_count,
-                    'last_seen': p.last_seen.isoformat() if p.last_seen else None,
-                    'enabled': p.enabled
-                }
-                for p in prefs
-            ]
+            return [self._preference_to_dict(p) for p in prefs]
             
         except Exception as e:
             logger.error(f"Failed to list preferences: {e}")
             return []
     
+    def find_matching_preferences(
+        self,
+        preference_type: str,
+        context: dict,
+        min_confidence: float = 0.7
+    ) -> List[Dict]:
+        """
+        查找触发条件与上下文匹配的全部偏好（匹配在 SQL 中完成）
+        
+        参数:
+        - preference_type: 'vendor_folder' | 'doctype_partition' | 'naming_template'
+        - context: {'vendor': 'ABC Corp', 'doc_type': 'invoice', ...}
+        - min_confidence: 最低置信度阈值
+        
+        返回: 按置信度降序排列的偏好列表
+        """
+        try:
+            prefs = self.db.session.query(LearnedPreference).filter(
+                LearnedPreference.preference_type == preference_type,
+                LearnedPreference.enabled == True,
+                LearnedPreference.confidence >= min_confidence,
+                LearnedPreference.matches_clause(context)
+            ).order_by(desc(LearnedPreference.confidence)).all()
+            
+            return [self._preference_to_dict(p) for p in prefs]
+            
+        except Exception as e:
+            logger.error(f"Failed to find matching preferences: {e}")
+            return []
+    
+    @staticmethod
+    def _preference_to_dict(p: LearnedPreference) -> Dict:
+        """偏好转为字典（用于 UI 展示）"""
+        return {
+            'id': p.id,
+            'type': p.preference_type,
+            'vendor': p.trigger_vendor,
+            'doc_type': p.trigger_doc_type,
+            'conditions': p.get_trigger_conditions_dict(),
+            'value': p.preference_value,
+            'confidence': p.confidence,
+            'sample_count': p.sample_count,
+            'last_seen': p.last_seen.isoformat() if p.last_seen else None,
+            'enabled': p.enabled
+        }
+    
     def disable_preference(self, preference_id: int):
         """禁用某个偏好"""
         try:
@@ -426,11 +858,55 @@ class PreferenceRepository:
                 )
                 self.db.session.add(audit)
                 
-                self.db.session.commit()
+                self.db.commit()
+                self._snapshot.invalidate()
                 logger.info(f"Preference disabled: {preference_id}")
                 
         except Exception as e:
-            self.db.session.rollback()
+            self.db.rollback()
             logger.error(f"Failed to disable preference: {e}")
             raise
 
+
+class LLMCacheRepository:
+    """LLM 分析结果缓存仓库"""
+    
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+    
+    def get(self, cache_key: str, ttl_days: Optional[int] = None) -> Optional[dict]:
+        """
+        读取缓存的分析结果
+        
+        参数:
+        - cache_key: 缓存键（内容哈希）
+        - ttl_days: 有效期（天），为 None 时永不过期
+        
+        返回: 分析结果字典，未命中或已过期时返回 None
+        """
+        try:
+            entry = self.db.session.get(LLMCache, cache_key)
+            if entry is None:
+                return None
+            if ttl_days is not None and entry.created_at < datetime.utcnow() - timedelta(days=ttl_days):
+                return None
+            return json_loads(entry.result_json)
+            
+        except Exception as e:
+            logger.error(f"Failed to read LLM cache: {e}")
+            return None
+    
+    def put(self, cache_key: str, model: str, result: dict):
+        """写入（或覆盖）分析结果"""
+        try:
+            self.db.session.merge(LLMCache(
+                cache_key=cache_key,
+                model=model,
+                result_json=json_dumps(result),
+                created_at=datetime.utcnow()
+            ))
+            self.db.commit()
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to write LLM cache: {e}")
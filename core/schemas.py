@@ -3,8 +3,46 @@
 定义 LLM 处理的输入输出数据结构
 """
 
-from typing import Optional, Dict
-from pydantic import BaseModel, Field, field_validator
+import os
+from typing import Any, Optional, Dict, List, Union
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+# JSON Schema 示例：仅在设置 SCHEMA_EXAMPLES 环境变量时写入模型 schema。
+# structured output 会把模型 schema 随每次请求发给 LLM，默认不附带示例以减少 token 和 schema 生成开销。
+FILE_ANALYSIS_EXAMPLE = {
+    "category": "invoice",
+    "confidence": 0.95,
+    "extracted_date": "2024-03",
+    "extracted_amount": "1580元",
+    "vendor_or_party": "阿里云",
+    "title": "云服务费用",
+    "suggested_filename": "[发票]_2024-03_阿里云_云服务费用_1580元",
+    "rationale": "文档包含发票关键词、税号、价税合计等信息",
+    "metadata": {"tax_id": "91110000123456789X"}
+}
+
+RENAME_PLAN_EXAMPLE = {
+    "category": "invoice",
+    "new_name": "[发票]_2024-03_阿里云_1580元.pdf",
+    "dest_dir": "archive/发票/2024/03",
+    "confidence": 0.95,
+    "extracted": {
+        "date_ym": "2024-03",
+        "amount": "1580元",
+        "vendor": "阿里云"
+    },
+    "rationale": "发票关键词命中(score=9.0)",
+    "is_valid": True,
+    "validation_msg": ""
+}
+
+
+def _schema_examples(example: dict) -> Optional[dict]:
+    """返回 json_schema_extra 配置（未启用示例时为 None）"""
+    if os.getenv("SCHEMA_EXAMPLES"):
+        return {"example": example}
+    return None
 
 
 class FileAnalysis(BaseModel):
@@ -54,20 +92,42 @@ class FileAnalysis(BaseModel):
         description="其他提取的元数据(键值对)"
     )
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "category": "invoice",
-                "confidence": 0.95,
-                "extracted_date": "2024-03",
-                "extracted_amount": "1580元",
-                "vendor_or_party": "阿里云",
-                "title": "云服务费用",
-                "suggested_filename": "[发票]_2024-03_阿里云_云服务费用_1580元",
-                "rationale": "文档包含发票关键词、税号、价税合计等信息",
-                "metadata": {"tax_id": "91110000123456789X"}
-            }
-        }
+    # 不可变：实例创建后不再修改（需要变更时用 model_copy(update=...)）
+    model_config = ConfigDict(
+        frozen=True,
+        extra='ignore',
+        json_schema_extra=_schema_examples(FILE_ANALYSIS_EXAMPLE),
+    )
+
+    @classmethod
+    def from_llm_json(cls, raw: Union[str, bytes, Dict[str, Any]]) -> "FileAnalysis":
+        """从 LLM 返回的 JSON（字符串或已解析的字典）构建，执行完整校验"""
+        if isinstance(raw, (str, bytes)):
+            return cls.model_validate_json(raw)
+        return cls.model_validate(raw)
+
+    @classmethod
+    def from_cached(cls, raw: Dict[str, Any]) -> "FileAnalysis":
+        """从已校验过的数据（缓存、model_dump 结果）构建，跳过校验"""
+        return cls.model_construct(**raw)
+
+
+class BatchFileAnalysis(FileAnalysis):
+    """
+    批量分析中的单个文件结果（附带文件序号，用于还原顺序）
+    """
+    file_index: int = Field(
+        description="对应输入中的文件序号(从 1 开始)"
+    )
+
+
+class FileAnalysisBatch(BaseModel):
+    """
+    批量文件分析结果（一次 LLM 调用分析多个文件）
+    """
+    results: List[BatchFileAnalysis] = Field(
+        description="每个文件的分析结果，与输入文件一一对应"
+    )
 
 
 class RenamePlan(BaseModel):
@@ -114,21 +174,10 @@ class RenamePlan(BaseModel):
         description="校验消息（校验失败时的原因）"
     )
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "category": "invoice",
-                "new_name": "[发票]_2024-03_阿里云_1580元.pdf",
-                "dest_dir": "archive/发票/2024/03",
-                "confidence": 0.95,
-                "extracted": {
-                    "date_ym": "2024-03",
-                    "amount": "1580元",
-                    "vendor": "阿里云"
-                },
-                "rationale": "发票关键词命中(score=9.0)",
-                "is_valid": True,
-                "validation_msg": ""
-            }
-        }
+    # 不可变：实例创建后不再修改（需要变更时用 model_copy(update=...)）
+    model_config = ConfigDict(
+        frozen=True,
+        extra='ignore',
+        json_schema_extra=_schema_examples(RENAME_PLAN_EXAMPLE),
+    )
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batch API 离线批量分析测试脚本
+使用模拟的 OpenAI 客户端（不联网）验证提交、收取，以及结果进入待审批队列
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+# 修复 Windows 控制台 UTF-8 输出问题
+if sys.platform == "win32":
+    os.system("chcp 65001 > nul")
+    if sys.stdout.encoding != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core import llm_processor
+
+
+def _analysis_json(custom_id: str) -> str:
+    """模拟模型返回的 FileAnalysis JSON"""
+    return json.dumps({
+        "category": "invoice",
+        "confidence": 0.9,
+        "suggested_filename": f"[发票]_{custom_id}",
+        "extracted_date": "2024-03",
+        "extracted_amount": None,
+        "vendor_or_party": "阿里云",
+        "title": custom_id,
+        "rationale": "batch",
+    }, ensure_ascii=False)
+
+
+class FakeBatchClient:
+    """模拟 OpenAI SDK 的 files / batches 接口"""
+
+    def __init__(self):
+        self.uploads = {}
+        self.status = "in_progress"
+        self.input_file_id = None
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        _, buffer = file
+        file_id = f"file-{len(self.uploads) + 1}"
+        self.uploads[file_id] = buffer.read()
+        return SimpleNamespace(id=file_id)
+
+    def _file_content(self, file_id):
+        return io.BytesIO(self.uploads[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        self.input_file_id = input_file_id
+        return SimpleNamespace(id="batch_test")
+
+    def _retrieve(self, batch_id):
+        output_file_id = "file-out" if self.status == "completed" else None
+        return SimpleNamespace(status=self.status, output_file_id=output_file_id)
+
+    def requests(self) -> list:
+        """已提交的请求行"""
+        return [json.loads(line) for line in self.uploads[self.input_file_id].splitlines()]
+
+    def complete(self, failed=()):
+        """生成输出文件并把任务标记为完成（failed 中的 custom_id 不写入输出）"""
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": _analysis_json(request["custom_id"])}}]
+                }},
+            }, ensure_ascii=False)
+            for request in self.requests()
+            if request["custom_id"] not in failed
+        ]
+        self.uploads["file-out"] = "\n".join(lines).encode("utf-8")
+        self.status = "completed"
+
+
+@contextmanager
+def fake_client_env():
+    """安装模拟客户端，退出时恢复"""
+    client = FakeBatchClient()
+    saved = llm_processor._get_openai_client
+    llm_processor._get_openai_client = lambda: client
+    try:
+        yield client
+    finally:
+        llm_processor._get_openai_client = saved
+
+
+def test_submit_one_request_per_file():
+    """测试 1: 每个文件一行请求，custom_id 与模型配置正确"""
+    with fake_client_env() as client:
+        batch_id = llm_processor.submit_batch_analysis([
+            ("h1", "发票号码 12345 阿里云", "a.pdf"),
+            ("h2", "", "b.pdf"),
+        ])
+        requests = client.requests()
+        assert batch_id == "batch_test"
+        assert [r["custom_id"] for r in requests] == ["h1", "h2"]
+        assert requests[0]["body"]["model"] == llm_processor._llm_config()[0]
+        assert "a.pdf" in requests[0]["body"]["messages"][-1]["content"]
+    return True
+
+
+def test_collect_waits_and_falls_back():
+    """测试 2: 任务未结束返回 None；完成后解析结果，缺失的请求回退"""
+    filenames = {"h1": "a.pdf", "h2": "b.pdf"}
+    with fake_client_env() as client:
+        llm_processor.submit_batch_analysis([("h1", "x", "a.pdf"), ("h2", "y", "b.pdf")])
+        assert llm_processor.collect_batch_analysis("batch_test", filenames) is None
+
+        client.complete(failed={"h2"})
+        results = llm_processor.collect_batch_analysis("batch_test", filenames)
+        assert results["h1"].suggested_filename == "[发票]_h1"
+        assert results["h2"].category == "default"
+        assert results["h2"].confidence == 0.2
+    return True
+
+
+def test_failed_batch_raises():
+    """测试 3: 任务失败/过期时抛出 RuntimeError"""
+    with fake_client_env() as client:
+        client.status = "expired"
+        try:
+            llm_processor.collect_batch_analysis("batch_test")
+        except RuntimeError:
+            return True
+    return False
+
+
+def test_workflow_results_enter_pending():
+    """测试 4: 工作流提交 inbox 文件，收取后生成待审批 JSON，不移动文件"""
+    from run_graph_once import JanitorWorkflow
+
+    saved_cwd, saved_home = os.getcwd(), os.environ.get("HOME")
+    with tempfile.TemporaryDirectory() as tmp, fake_client_env() as client:
+        os.chdir(tmp)
+        os.environ["HOME"] = tmp
+        workflow = None
+        try:
+            Path("config.yaml").write_text(
+                "paths: {inbox: inbox, archive: archive, logs: logs}\n", encoding="utf-8"
+            )
+            inbox = Path("inbox")
+            inbox.mkdir()
+            (inbox / "invoice.txt").write_text("发票号码 12345 阿里云 2024-03", encoding="utf-8")
+            (inbox / "copy.txt").write_text("发票号码 12345 阿里云 2024-03", encoding="utf-8")
+            (inbox / "other.txt").write_text("会议纪要", encoding="utf-8")
+
+            workflow = JanitorWorkflow()
+            files = sorted(inbox.iterdir())
+            assert workflow.submit_batch_job(files) == "batch_test"
+            # 内容相同的文件只请求一次；已排队的文件不重复提交
+            assert len(client.requests()) == 2
+            assert workflow.submit_batch_job(files) is None
+
+            records, running = workflow.collect_batch_jobs()
+            assert (records, running) == ([], 1)
+
+            client.complete()
+            records, running = workflow.collect_batch_jobs()
+            assert running == 0
+            assert [r["decision"] for r in records] == ["pending"] * 3
+            assert len(list(Path("pending").glob("*.json"))) == 3
+            assert workflow.list_batch_jobs() == []
+            assert sorted(p.name for p in inbox.iterdir()) == ["copy.txt", "invoice.txt", "other.txt"]
+        finally:
+            if workflow is not None:
+                workflow.approval_repo.stop_writer()
+                workflow.memory_db.close()
+            os.chdir(saved_cwd)
+            if saved_home is None:
+                os.environ.pop("HOME", None)
+            else:
+                os.environ["HOME"] = saved_home
+    return True
+
+
+def main():
+    """主函数"""
+    print("\n🚀 Batch API 离线批量分析测试")
+    print(f"📍 项目根目录: {project_root}")
+    print()
+
+    tests = [
+        ("提交请求", test_submit_one_request_per_file),
+        ("收取与回退", test_collect_waits_and_falls_back),
+        ("失败任务", test_failed_batch_raises),
+        ("进入待审批队列", test_workflow_results_enter_pending),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            results.append((name, test()))
+        except AssertionError as e:
+            print(f"❌ {name}: {e}")
+            results.append((name, False))
+
+    # 总结
+    print("\n" + "=" * 60)
+    print("📊 测试结果总结")
+    print("=" * 60)
+
+    for name, passed in results:
+        status = "✅ 通过" if passed else "❌ 失败"
+        print(f"{name:20s} {status}")
+
+    passed = sum(1 for _, p in results if p)
+    total = len(results)
+
+    print(f"\n通过: {passed}/{total}")
+    return 0 if passed == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
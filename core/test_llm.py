@@ -7,6 +7,7 @@ LLM 处理器测试脚本
 
 import os
 import sys
+import asyncio
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -14,16 +15,10 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from dotenv import load_dotenv
-from core.llm_processor import analyze_file
+from core.llm_processor import analyze_file, analyze_file_async
 
 
-def test_llm_basic():
-    """基础测试：发票文档"""
-    print("=" * 60)
-    print("测试 1: 发票文档分析")
-    print("=" * 60)
-    
-    text = """
+INVOICE_TEXT = """
     发票测试文档
     
     开票日期: 2024年3月15日
@@ -34,33 +29,8 @@ def test_llm_basic():
     
     这是一张增值税专用发票。
     """
-    
-    filename = "test_invoice.txt"
-    
-    try:
-        result = analyze_file(text, filename)
-        print(f"\n✅ 分析成功！")
-        print(f"  - 类别: {result.category}")
-        print(f"  - 置信度: {result.confidence:.2f}")
-        print(f"  - 日期: {result.extracted_date}")
-        print(f"  - 金额: {result.extracted_amount}")
-        print(f"  - 供应商: {result.vendor_or_party}")
-        print(f"  - 标题: {result.title}")
-        print(f"  - 建议文件名: {result.suggested_filename}")
-        print(f"  - 理由: {result.rationale}")
-        return True
-    except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
-        return False
-
 
-def test_llm_contract():
-    """测试 2: 合同文档"""
-    print("\n" + "=" * 60)
-    print("测试 2: 合同文档分析")
-    print("=" * 60)
-    
-    text = """
+CONTRACT_TEXT = """
     劳动合同
     
     甲方（用人单位）：ABC科技有限公司
@@ -73,45 +43,108 @@ def test_llm_contract():
     签订日期：2024年1月10日
     生效日期：2024年2月1日
     """
-    
-    filename = "labor_contract.pdf"
-    
+
+# (文本, 文件名)，顺序与 test_llm_basic / test_llm_contract / test_llm_empty 一致
+CASES = [
+    (INVOICE_TEXT, "test_invoice.txt"),
+    (CONTRACT_TEXT, "labor_contract.pdf"),
+    ("", "invoice_2024_03.pdf"),
+]
+
+
+def _run(fn, *args):
+    """执行分析（不使用结果缓存，确保真正请求 API），返回结果或异常"""
     try:
-        result = analyze_file(text, filename)
-        print(f"\n✅ 分析成功！")
-        print(f"  - 类别: {result.category}")
-        print(f"  - 置信度: {result.confidence:.2f}")
-        print(f"  - 日期: {result.extracted_date}")
-        print(f"  - 对方: {result.vendor_or_party}")
-        print(f"  - 标题: {result.title}")
-        print(f"  - 建议文件名: {result.suggested_filename}")
-        print(f"  - 理由: {result.rationale}")
-        return True
+        return fn(*args, use_cache=False)
     except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
+        return e
+
+
+def report_basic(result):
+    """输出测试 1 结果：发票文档"""
+    print("=" * 60)
+    print("测试 1: 发票文档分析")
+    print("=" * 60)
+    
+    if isinstance(result, Exception):
+        print(f"\n❌ 测试失败: {result}")
+        return False
+    
+    print(f"\n✅ 分析成功！")
+    print(f"  - 类别: {result.category}")
+    print(f"  - 置信度: {result.confidence:.2f}")
+    print(f"  - 日期: {result.extracted_date}")
+    print(f"  - 金额: {result.extracted_amount}")
+    print(f"  - 供应商: {result.vendor_or_party}")
+    print(f"  - 标题: {result.title}")
+    print(f"  - 建议文件名: {result.suggested_filename}")
+    print(f"  - 理由: {result.rationale}")
+    return True
+
+
+def report_contract(result):
+    """输出测试 2 结果：合同文档"""
+    print("\n" + "=" * 60)
+    print("测试 2: 合同文档分析")
+    print("=" * 60)
+    
+    if isinstance(result, Exception):
+        print(f"\n❌ 测试失败: {result}")
         return False
+    
+    print(f"\n✅ 分析成功！")
+    print(f"  - 类别: {result.category}")
+    print(f"  - 置信度: {result.confidence:.2f}")
+    print(f"  - 日期: {result.extracted_date}")
+    print(f"  - 对方: {result.vendor_or_party}")
+    print(f"  - 标题: {result.title}")
+    print(f"  - 建议文件名: {result.suggested_filename}")
+    print(f"  - 理由: {result.rationale}")
+    return True
 
 
-def test_llm_empty():
-    """测试 3: 空内容（仅文件名）"""
+def report_empty(result):
+    """输出测试 3 结果：空内容（仅文件名）"""
     print("\n" + "=" * 60)
     print("测试 3: 空内容分析（仅文件名）")
     print("=" * 60)
     
-    text = ""
-    filename = "invoice_2024_03.pdf"
-    
-    try:
-        result = analyze_file(text, filename)
-        print(f"\n✅ 分析成功！")
-        print(f"  - 类别: {result.category}")
-        print(f"  - 置信度: {result.confidence:.2f}")
-        print(f"  - 建议文件名: {result.suggested_filename}")
-        print(f"  - 理由: {result.rationale}")
-        return True
-    except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
+    if isinstance(result, Exception):
+        print(f"\n❌ 测试失败: {result}")
         return False
+    
+    print(f"\n✅ 分析成功！")
+    print(f"  - 类别: {result.category}")
+    print(f"  - 置信度: {result.confidence:.2f}")
+    print(f"  - 建议文件名: {result.suggested_filename}")
+    print(f"  - 理由: {result.rationale}")
+    return True
+
+
+REPORTS = [report_basic, report_contract, report_empty]
+
+
+def test_llm_basic():
+    """基础测试：发票文档"""
+    return report_basic(_run(analyze_file, *CASES[0]))
+
+
+def test_llm_contract():
+    """测试 2: 合同文档"""
+    return report_contract(_run(analyze_file, *CASES[1]))
+
+
+def test_llm_empty():
+    """测试 3: 空内容（仅文件名）"""
+    return report_empty(_run(analyze_file, *CASES[2]))
+
+
+async def analyze_all_async():
+    """并发分析全部用例（总耗时约为最慢的一次请求；不使用缓存，确保真正请求 API）"""
+    return await asyncio.gather(
+        *(analyze_file_async(text, filename, use_cache=False) for text, filename in CASES),
+        return_exceptions=True
+    )
 
 
 def main():
@@ -145,11 +178,9 @@ def main():
     print(f"  - API Key: {api_key[:10]}...{api_key[-4:]}")
     print()
     
-    # 运行测试
-    results = []
-    results.append(test_llm_basic())
-    results.append(test_llm_contract())
-    results.append(test_llm_empty())
+    # 运行测试：并发发出全部请求，再按顺序输出结果
+    outcomes = asyncio.run(analyze_all_async())
+    results = [report(outcome) for report, outcome in zip(REPORTS, outcomes)]
     
     # 总结
     print("\n" + "=" * 60)
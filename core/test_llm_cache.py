@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM 结果缓存测试脚本
+使用桩 LLM（不联网）验证 analyze_file / analyze_file_batch 的缓存命中
+"""
+
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# 修复 Windows 控制台 UTF-8 输出问题
+if sys.platform == "win32":
+    os.system("chcp 65001 > nul")
+    if sys.stdout.encoding != 'utf-8':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core import llm_processor
+from core.memory import MemoryDatabase, LLMCacheRepository
+from core.schemas import FileAnalysis, FileAnalysisBatch
+
+
+FILES = [
+    ("发票号码 12345 阿里云 2024-03 金额 1580元", "invoice_aliyun.pdf"),
+    ("甲方：腾讯科技 乙方：某公司 合同期限一年", "contract_tencent.docx"),
+    ("", "empty.txt"),
+]
+
+
+def _analysis(filename: str, **extra) -> dict:
+    """桩 LLM 返回的分析结果"""
+    return dict(
+        category="other",
+        confidence=0.9,
+        suggested_filename=filename,
+        extracted_date=None,
+        extracted_amount=None,
+        vendor_or_party=None,
+        title=filename,
+        rationale="stub",
+        **extra,
+    )
+
+
+class StubLLM:
+    """记录调用次数的桩 LLM（按输出结构返回单个或批量结果）"""
+
+    def __init__(self, schema: type, calls: list):
+        self.schema = schema
+        self.calls = calls
+
+    def invoke(self, messages):
+        self.calls.append(self.schema.__name__)
+        prompt = messages[-1].content
+        if self.schema is FileAnalysisBatch:
+            names = [
+                line.split(": ", 1)[1]
+                for line in prompt.splitlines()
+                if line.startswith("--- FILE ")
+            ]
+            return FileAnalysisBatch(results=[
+                _analysis(name, file_index=idx) for idx, name in enumerate(names, 1)
+            ])
+        return FileAnalysis(**_analysis("single"))
+
+
+@contextmanager
+def stub_llm_env():
+    """
+    安装桩 LLM 与临时缓存数据库，退出时恢复原状态
+
+    Yields:
+        LLM 调用记录列表（每次调用追加输出结构名）
+    """
+    calls: list = []
+    saved = (llm_processor.get_structured_llm, llm_processor._llm_cache)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MemoryDatabase(Path(tmp) / "memory.db")
+        llm_processor.get_structured_llm = lambda schema: StubLLM(schema, calls)
+        llm_processor._llm_cache = LLMCacheRepository(db)
+        llm_processor._llm_memory_cache.clear()
+        try:
+            yield calls
+        finally:
+            llm_processor.get_structured_llm, llm_processor._llm_cache = saved
+            llm_processor._llm_memory_cache.clear()
+            db.close()
+
+
+def test_batch_second_run_uses_cache():
+    """测试 1: 批量分析同一批文件两次，第二次不调用 LLM"""
+    with stub_llm_env() as calls:
+        first = llm_processor.analyze_file_batch(FILES, batch_size=8)
+        assert calls == ["FileAnalysisBatch"], calls
+
+        calls.clear()
+        second = llm_processor.analyze_file_batch(FILES, batch_size=8)
+        assert calls == [], calls
+        assert [a.suggested_filename for a in second] == [a.suggested_filename for a in first]
+    return True
+
+
+def test_batch_cache_survives_process_memory():
+    """测试 2: 清空进程内缓存后，第二次仍由 SQLite 缓存命中"""
+    with stub_llm_env() as calls:
+        llm_processor.analyze_file_batch(FILES, batch_size=8)
+        llm_processor._llm_memory_cache.clear()
+
+        calls.clear()
+        llm_processor.analyze_file_batch(FILES, batch_size=8)
+        assert calls == [], calls
+    return True
+
+
+def test_batch_only_sends_misses():
+    """测试 3: 部分命中时只把未命中的文件发给 LLM，结果与单文件分析共用缓存"""
+    with stub_llm_env() as calls:
+        text, filename = FILES[0]
+        llm_processor.analyze_file(text, filename)
+        assert calls == ["FileAnalysis"], calls
+
+        calls.clear()
+        results = llm_processor.analyze_file_batch(FILES, batch_size=8)
+        assert calls == ["FileAnalysisBatch"], calls
+        assert results[0].suggested_filename == "single"
+        assert [a.suggested_filename for a in results[1:]] == [name for _, name in FILES[1:]]
+    return True
+
+
+def test_api_base_change_misses_cache():
+    """测试 4: 切换 API 地址后不复用旧服务端的分析结果"""
+    saved_base = os.environ.get("OPENAI_API_BASE")
+    try:
+        with stub_llm_env() as calls:
+            os.environ["OPENAI_API_BASE"] = "https://api.example.com/v1"
+            llm_processor.analyze_file_batch(FILES, batch_size=8)
+
+            calls.clear()
+            os.environ["OPENAI_API_BASE"] = "https://other.example.com/v1"
+            llm_processor.analyze_file_batch(FILES, batch_size=8)
+            assert calls == ["FileAnalysisBatch"], calls
+    finally:
+        if saved_base is None:
+            os.environ.pop("OPENAI_API_BASE", None)
+        else:
+            os.environ["OPENAI_API_BASE"] = saved_base
+    return True
+
+
+def main():
+    """主函数"""
+    print("\n🚀 LLM 结果缓存测试")
+    print(f"📍 项目根目录: {project_root}")
+    print()
+
+    tests = [
+        ("批量二次运行命中缓存", test_batch_second_run_uses_cache),
+        ("SQLite 缓存命中", test_batch_cache_survives_process_memory),
+        ("只发送未命中文件", test_batch_only_sends_misses),
+        ("切换 API 地址", test_api_base_change_misses_cache),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            results.append((name, test()))
+        except AssertionError as e:
+            print(f"❌ {name}: LLM 调用记录 {e}")
+            results.append((name, False))
+
+    # 总结
+    print("\n" + "=" * 60)
+    print("📊 测试结果总结")
+    print("=" * 60)
+
+    for name, passed in results:
+        status = "✅ 通过" if passed else "❌ 失败"
+        print(f"{name:20s} {status}")
+
+    passed = sum(1 for _, p in results if p)
+    total = len(results)
+
+    print(f"\n通过: {passed}/{total}")
+    return 0 if passed == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,30 +3,79 @@
 对重命名计划进行安全性和有效性校验
 """
 
-import re
-from pathlib import Path
+import os
+import sys
+from functools import lru_cache
+from operator import attrgetter
 from typing import List
 
 from core.schemas import RenamePlan
 
 
+# Windows 兼容校验（保留名、盘符、UNC 路径）：Windows 上始终启用；
+# 其他平台默认也启用，保证归档结果拷贝/同步到 Windows 后依然可用，
+# 只在纯 POSIX 环境下可设置 WINDOWS_COMPAT=0 跳过
+WINDOWS_COMPAT = sys.platform == "win32" or os.getenv("WINDOWS_COMPAT", "1") != "0"
+
 # Windows 文件名非法字符
 INVALID_WIN_CHARS = r'<>:"/\\|?*'
-INVALID_CHARS_PATTERN = re.compile(f"[{re.escape(INVALID_WIN_CHARS)}]")
+# 逐字符替换用的转换表（str.translate 比正则替换更快）
+INVALID_CHARS_TABLE = str.maketrans({char: "_" for char in INVALID_WIN_CHARS})
+# 纯 ASCII 文件名走 bytes 路径：256 字节查表比 str 的字典转换表快得多
+INVALID_CHARS_BYTES_TABLE = bytes.maketrans(
+    INVALID_WIN_CHARS.encode("ascii"), b"_" * len(INVALID_WIN_CHARS)
+)
+# 与 str.strip() 在 ASCII 范围内去除的空白一致（bytes.strip() 默认不含 \x1c-\x1f）
+ASCII_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+# Windows 保留文件名（不区分大小写，不含扩展名）
+# 与 CPython ntpath 的保留名一致：含 CONIN$/CONOUT$ 及上标数字 ¹²³ 结尾的 COM/LPT
+RESERVED_NAMES = frozenset({
+    "CON", "PRN", "AUX", "NUL", "CONIN$", "CONOUT$",
+    *(f"COM{c}" for c in "123456789\xb9\xb2\xb3"),
+    *(f"LPT{c}" for c in "123456789\xb9\xb2\xb3"),
+})
 
+# 路径中的非法字符，及检测用的删除表（translate 后长度变化即包含非法字符）
+INVALID_PATH_CHARS = '<>"|?*'
+INVALID_PATH_CHARS_TABLE = str.maketrans('', '', INVALID_PATH_CHARS)
+INVALID_PATH_CHARS_SET = frozenset(INVALID_PATH_CHARS)
 
+
+@lru_cache(maxsize=4096)
 def sanitize_filename(filename: str) -> str:
     """
     清理文件名中的非法字符
     
+    纯函数，按文件名缓存结果（watcher 反复处理、重试计划时会重复校验同一文件名）
+    
     Args:
         filename: 原始文件名
     
     Returns:
         清理后的文件名
     """
+    # 快速路径：大多数文件名本身已合法（首尾不是空白或点号、不含非法字符），原样返回
+    if (
+        filename
+        and filename[0] != "." and filename[-1] != "."
+        and not filename[0].isspace() and not filename[-1].isspace()
+        and not any(char in filename for char in INVALID_WIN_CHARS)
+    ):
+        return filename
+    
+    # ASCII 快速路径：同样的清理步骤在 bytes 上完成
+    if filename.isascii():
+        cleaned_bytes = (
+            filename.encode("ascii")
+            .translate(INVALID_CHARS_BYTES_TABLE)
+            .strip(ASCII_WHITESPACE)
+            .strip(b".")
+        )
+        return cleaned_bytes.decode("ascii") or "unnamed"
+    
     # 移除 Windows 非法字符，替换为下划线
-    cleaned = INVALID_CHARS_PATTERN.sub("_", filename)
+    cleaned = filename.translate(INVALID_CHARS_TABLE)
     
     # 去除首尾空格
     cleaned = cleaned.strip()
@@ -41,10 +90,13 @@ def sanitize_filename(filename: str) -> str:
     return cleaned
 
 
+@lru_cache(maxsize=4096)
 def is_safe_path(path_str: str) -> tuple[bool, str]:
     """
     检查路径是否安全（防止目录穿越攻击）
     
+    纯函数，按路径字符串缓存结果（批量校验时大量计划共享同一目标目录）
+    
     Args:
         path_str: 路径字符串
     
@@ -57,27 +109,28 @@ def is_safe_path(path_str: str) -> tuple[bool, str]:
         
         # 1. 拦截 Windows 盘符 (如 C:, d:) 和 UNC 路径 (//, \\)
         # 建议 #5 的修复
-        if re.match(r'^[a-zA-Z]:', s):
-            return False, "路径包含盘符，必须使用相对路径"
-        if s.startswith(("\\\\", "//")):
-            return False, "禁止使用 UNC 网络路径"
+        if WINDOWS_COMPAT:
+            if len(s) >= 2 and s[1] == ':' and ('A' <= s[0] <= 'Z' or 'a' <= s[0] <= 'z'):
+                return False, "路径包含盘符，必须使用相对路径"
+            if s.startswith(("\\\\", "//")):
+                return False, "禁止使用 UNC 网络路径"
             
-        path = Path(s)
+        # 统一转为 posix 风格（两种分隔符都按目录分隔处理，与平台无关）
+        path_str_normalized = s.replace("\\", "/")
         
         # 2. 检查是否包含 ".." (父目录引用)
-        if ".." in path.parts:
+        if ".." in path_str_normalized.split("/"):
             return False, "路径包含 '..' 父目录引用，存在安全风险"
         
         # 3. 检查是否为绝对路径（必须是相对路径）
-        if path.is_absolute():
+        if os.path.isabs(s):
             return False, "路径必须是相对路径，不能使用绝对路径"
         
         # 4. 检查路径是否包含非法字符
-        # 统一转为 posix 风格检查
-        path_str_normalized = str(path).replace("\\", "/")
-        for char in '<>"|?*':
-            if char in path_str_normalized:
-                return False, f"路径包含非法字符: '{char}'"
+        if len(path_str_normalized.translate(INVALID_PATH_CHARS_TABLE)) != len(path_str_normalized):
+            # 仅在确认存在非法字符后单次扫描路径，报告第一个出现的非法字符
+            char = next(c for c in path_str_normalized if c in INVALID_PATH_CHARS_SET)
+            return False, f"路径包含非法字符: '{char}'"
         
         # 5. 再次拦截危险前缀（双重保险）
         dangerous_prefixes = ["/", "\\"]
@@ -104,48 +157,79 @@ def validate_plan(plan: RenamePlan) -> RenamePlan:
         plan: 待校验的重命名计划
     
     Returns:
-        更新后的 RenamePlan 对象（带校验结果）
+        更新后的 RenamePlan 副本（带校验结果；RenamePlan 不可变，原对象不会被修改）
     """
-    errors: List[str] = []
+    return _apply_check(plan, _check_name_and_dir(plan.new_name, plan.dest_dir))
+
+
+# 校验只依赖 (new_name, dest_dir) 两个字段
+_plan_check_key = attrgetter("new_name", "dest_dir")
+
+
+@lru_cache(maxsize=4096)
+def _check_name_and_dir(original_name: str, dest_dir: str) -> tuple:
+    """
+    校验文件名与目标目录（纯字符串输入，结果可缓存）
+    
+    Args:
+        original_name: 原始文件名
+        dest_dir: 目标目录
     
-    # 1. 校验并清理 new_name
-    original_name = plan.new_name
+    Returns:
+        (清理后的文件名, 是否有效, 校验信息)
+    """
+    # 1. 清理 new_name；保留名按第一个点号之前的部分判定（与 Windows / pathlib 一致，"CON.tar.gz" 同样是保留名）
     cleaned_name = sanitize_filename(original_name)
+    name_without_ext = cleaned_name.partition(".")[0].upper() if WINDOWS_COMPAT else ""
+    
+    # 2. 校验 dest_dir
+    is_safe, error_msg = is_safe_path(dest_dir)
+    
+    # 快速路径：绝大多数计划全部通过，直接返回，不构造错误列表
+    if (
+        cleaned_name
+        and len(cleaned_name) <= 255
+        and name_without_ext not in RESERVED_NAMES
+        and is_safe
+    ):
+        return cleaned_name, True, "校验通过"
     
-    if cleaned_name != original_name:
-        # 文件名被修改，记录警告但不算错误
-        plan.new_name = cleaned_name
-        if not cleaned_name:
-            errors.append(f"文件名无效: '{original_name}' -> 清理后为空")
+    # 3. 存在问题时汇总全部错误（一次性告诉用户所有需要修正的地方）
+    errors: List[str] = []
+    
+    if not cleaned_name:
+        errors.append(f"文件名无效: '{original_name}' -> 清理后为空")
     
     # 检查文件名长度（Windows 路径限制）
     if len(cleaned_name) > 255:
         errors.append(f"文件名过长: {len(cleaned_name)} 字符 (最大 255)")
     
     # 检查文件名是否为保留名称（Windows）
-    reserved_names = [
-        "CON", "PRN", "AUX", "NUL",
-        "COM1", "COM2", "COM3", "COM4", "COM5", "COM6", "COM7", "COM8", "COM9",
-        "LPT1", "LPT2", "LPT3", "LPT4", "LPT5", "LPT6", "LPT7", "LPT8", "LPT9"
-    ]
-    name_without_ext = Path(cleaned_name).stem.upper()
-    if name_without_ext in reserved_names:
+    if name_without_ext in RESERVED_NAMES:
         errors.append(f"文件名使用了 Windows 保留名称: {name_without_ext}")
     
-    # 2. 校验 dest_dir
-    is_safe, error_msg = is_safe_path(plan.dest_dir)
     if not is_safe:
         errors.append(f"目标路径不安全: {error_msg}")
     
-    # 3. 设置校验结果
-    if errors:
-        plan.is_valid = False
-        plan.validation_msg = "; ".join(errors)
-    else:
-        plan.is_valid = True
-        plan.validation_msg = "校验通过"
-    
-    return plan
+    return cleaned_name, False, "; ".join(errors)
+
+
+def _apply_check(plan: RenamePlan, result: tuple) -> RenamePlan:
+    """将校验结果写入计划副本（计划已带有相同的校验结果时原样返回）"""
+    cleaned_name, is_valid, validation_msg = result
+    # 重复校验（如修复循环后整批重新校验）：字段与缓存结果一致即说明已校验过，跳过复制
+    # 不能只看 validation_msg 是否非空：出错计划会预先写入错误信息，修改过的计划也可能带着旧结果
+    if (
+        plan.is_valid is is_valid
+        and plan.validation_msg == validation_msg
+        and plan.new_name == cleaned_name
+    ):
+        return plan
+    return plan.model_copy(update={
+        "new_name": cleaned_name,
+        "is_valid": is_valid,
+        "validation_msg": validation_msg,
+    })
 
 
 def validate_plans_batch(plans: List[RenamePlan]) -> List[RenamePlan]:
@@ -158,7 +242,18 @@ def validate_plans_batch(plans: List[RenamePlan]) -> List[RenamePlan]:
     Returns:
         校验后的计划列表
     """
-    return [validate_plan(plan) for plan in plans]
+    key, check, apply = _plan_check_key, _check_name_and_dir, _apply_check
+    # 批内按 (new_name, dest_dir) 去重：超大批量（如全量重建索引）时每个组合只校验一次，
+    # 也不会因为组合数超过 lru_cache 容量而反复淘汰、重算
+    results: dict = {}
+    validated: List[RenamePlan] = []
+    for plan in plans:
+        plan_key = key(plan)
+        result = results.get(plan_key)
+        if result is None:
+            result = results[plan_key] = check(*plan_key)
+        validated.append(apply(plan, result))
+    return validated
 
 
 def get_validation_stats(plans: List[RenamePlan]) -> dict:
@@ -171,21 +266,24 @@ def get_validation_stats(plans: List[RenamePlan]) -> dict:
     Returns:
         统计信息字典
     """
-    total = len(plans)
-    valid = sum(1 for p in plans if p.is_valid)
-    invalid = total - valid
+    # 单次遍历同时统计通过数并收集失败的计划
+    valid = 0
+    invalid_plans = []
+    for p in plans:
+        if p.is_valid:
+            valid += 1
+        else:
+            invalid_plans.append({
+                "file": p.new_name,
+                "reason": p.validation_msg
+            })
     
+    total = len(plans)
     return {
         "total": total,
         "valid": valid,
-        "invalid": invalid,
+        "invalid": total - valid,
         "valid_rate": valid / total if total > 0 else 0.0,
-        "invalid_plans": [
-            {
-                "file": p.new_name,
-                "reason": p.validation_msg
-            }
-            for p in plans if not p.is_valid
-        ]
+        "invalid_plans": invalid_plans
     }
 
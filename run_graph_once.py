@@ -27,12 +27,17 @@ from __future__ import annotations
 
 import sys
 import json
+import atexit
 import argparse
+import asyncio
+import copy
+import functools
 import re
 import os
 from pathlib import Path
 from datetime import datetime
-from typing import TypedDict, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, Optional, Dict, Any, List, Callable, Literal
 
 # 设置 UTF-8 编码支持 (Windows 控制台)
 if sys.platform == "win32":
@@ -45,18 +50,37 @@ if sys.platform == "win32":
 import yaml
 from dotenv import load_dotenv
 
+# 可选：orjson（C 实现，解析/序列化更快），未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # LangGraph 核心组件
 from langgraph.graph import StateGraph, END
+from langgraph.types import Command
 
 # 项目内部模块
 from core.schemas import RenamePlan
 from core.validator import validate_plan
-from utils.file_ops import discover_files, extract_text_preview_enhanced, get_file_size_mb, safe_move_file
-from core.llm_processor import analyze_file
+from utils.file_ops import (
+    discover_files, extract_text_preview_enhanced, get_file_size_mb, safe_move_file,
+    compute_full_file_hash
+)
+from core.llm_processor import (
+    analyze_file, analyze_file_async, analyze_file_batch,
+    submit_batch_analysis, collect_batch_analysis
+)
 
 # Memory 系统
 from core.memory import MemoryDatabase, ApprovalRepository, PreferenceRepository
-import hashlib
+
+def _dumpb(obj: Any, indent: bool = False) -> bytes:
+    """序列化 JSON 为 UTF-8 字节（优先使用 orjson，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
 
 # --- 辅助函数：PR#2 三级路由策略 ---
 
@@ -75,6 +99,12 @@ CAT_CN_MAP = {
 # 无效 Vendor 值列表（大小写不敏感）
 INVALID_VENDOR_VALUES = {"", "unknown", "n/a", "none", "无", "未知", "null"}
 
+# 日期分层路径使用的日期格式：YYYY[-./]MM（月份可省略）
+DATE_PARTITION_RE = re.compile(r"(?P<y>20\d{2})[-./]?(?P<m>\d{2})?")
+
+# 路径组件非法字符（Windows/Unix）替换为下划线的转换表
+PATH_COMPONENT_ILLEGAL_TABLE = str.maketrans({char: "_" for char in '/\\:*?"<>|'})
+
 
 def sanitize_path_component(value: str) -> str:
     """
@@ -89,8 +119,7 @@ def sanitize_path_component(value: str) -> str:
     if not value:
         return ""
     # 替换 Windows/Unix 路径非法字符
-    illegal_chars = r'[/\\:*?"<>|]'
-    sanitized = re.sub(illegal_chars, '_', value)
+    sanitized = value.translate(PATH_COMPONENT_ILLEGAL_TABLE)
     # 移除首尾空格和点（Windows 不允许文件夹名以点结尾）
     sanitized = sanitized.strip().rstrip('.')
     return sanitized
@@ -131,10 +160,10 @@ def build_date_partition_path(category: str, date_str: Optional[str]) -> str:
     # 解析日期
     year, month = "未知年份", "未知月份"
     if date_str:
-        m = re.match(r"(?P<y>20\d{2})[-./]?(?P<m>\d{2})?", date_str)
+        m = DATE_PARTITION_RE.match(date_str)
         if m:
-            year = m.group("y")
-            month = m.group("m") if m.group("m") else "01"
+            year, month = m.group("y", "m")
+            month = month or "01"
     
     return f"{cat_cn}/{year}/{month}"
 
@@ -213,17 +242,29 @@ class JanitorState(TypedDict, total=False):
 
 def node_extract_preview(state: JanitorState) -> JanitorState:
     """节点1: 提取文本预览（OCR V2 增强版）"""
-    fp = state["file_path"]  # 获取文件路径
-    max_preview = state.get("max_preview", 1000)
+    state["preview"], state["extraction_metadata"] = extract_preview(
+        state["file_path"], state.get("max_preview", 1000)
+    )
+    print_extraction_log(state["extraction_metadata"])
+    return state
+
+
+def extract_preview(fp: Path, max_preview: int = 1000) -> tuple:
+    """
+    提取文本预览及元数据（不打印日志，可在线程池中并发调用）
+    
+    Args:
+        fp: 文件路径
+        max_preview: 最大预览字符数
     
+    Returns:
+        (预览文本, 提取元数据)
+    """
     # 🆕 OCR V2: 使用增强版文本提取
     result = extract_text_preview_enhanced(fp, limit=max_preview)
     
-    # 提取文本内容
-    state["preview"] = result.get("text", "")
-    
     # 🆕 OCR V2: 保存元数据（排除 text 字段）
-    state["extraction_metadata"] = {
+    metadata = {
         "method": result.get("method", "unknown"),
         "confidence": result.get("confidence", 0.0),
         "quality_score": result.get("quality_score", 0),
@@ -233,20 +274,21 @@ def node_extract_preview(state: JanitorState) -> JanitorState:
         "char_count": result.get("char_count", 0),
         "error": result.get("error"),
     }
-    
-    # 🆕 打印简短日志
-    method = state["extraction_metadata"]["method"]
-    quality = state["extraction_metadata"]["quality_score"]
-    time_ms = state["extraction_metadata"]["processing_time_ms"]
+    return result.get("text", ""), metadata
+
+
+def print_extraction_log(metadata: Dict[str, Any]) -> None:
+    """打印文本提取的简短日志"""
+    method = metadata["method"]
+    quality = metadata["quality_score"]
+    time_ms = metadata["processing_time_ms"]
     cached = "_cached" in method
     
     print(f"   📄 文本提取: {method} | 质量={quality} | 耗时={time_ms}ms" + (" 💾" if cached else ""))
     
     # 如果质量较低，打印警告
-    if state["extraction_metadata"]["needs_review"]:
+    if metadata["needs_review"]:
         print(f"   ⚠️  OCR 质量较低 ({quality}分)，可能需要人工审查")
-    
-    return state
 
 
 def node_llm_analyze(state: JanitorState) -> JanitorState:
@@ -255,23 +297,26 @@ def node_llm_analyze(state: JanitorState) -> JanitorState:
     try:
         # 调用核心模块
         a = analyze_file(state.get("preview", ""), fp.name, max_preview=state.get("max_preview", 1000))
-        
-        # 将 Pydantic 对象转为 Dict 存入 State (方便序列化)
-        state["analysis"] = {
-            "category": a.category,
-            "confidence": a.confidence,
-            "suggested_filename": a.suggested_filename,
-            "extracted_date": a.extracted_date,
-            "extracted_amount": a.extracted_amount,
-            "vendor_or_party": a.vendor_or_party,
-            "title": a.title,
-            "rationale": a.rationale,
-        }
+        state["analysis"] = analysis_to_dict(a)
     except Exception as e:
         state["error"] = f"LLM 分析失败: {e}"
     return state
 
 
+def analysis_to_dict(a) -> Dict[str, Any]:
+    """将 FileAnalysis 转为 Dict 存入 State (方便序列化)"""
+    return {
+        "category": a.category,
+        "confidence": a.confidence,
+        "suggested_filename": a.suggested_filename,
+        "extracted_date": a.extracted_date,
+        "extracted_amount": a.extracted_amount,
+        "vendor_or_party": a.vendor_or_party,
+        "title": a.title,
+        "rationale": a.rationale,
+    }
+
+
 def node_build_plan(state: JanitorState) -> JanitorState:
     """
     节点3: 构建重命名计划 (RenamePlan)
@@ -286,7 +331,8 @@ def node_build_plan(state: JanitorState) -> JanitorState:
 
     # 如果之前的步骤报错，生成一个失败的计划
     if state.get("error"):
-        plan = RenamePlan(
+        # 字段均为本地常量，无需校验
+        plan = RenamePlan.model_construct(
             category="error",
             new_name=fp.name,
             dest_dir="quarantine/failed",
@@ -385,11 +431,18 @@ def node_build_plan(state: JanitorState) -> JanitorState:
     return state
 
 
-def node_validate(state: JanitorState) -> JanitorState:
-    """节点4: 安全校验"""
+def node_validate(state: JanitorState) -> Command[Literal["human_review", "skip"]]:
+    """节点4: 安全校验（不合法的计划直接跳转到 skip，不经过人工确认）"""
     # 复用 core.validator
-    state["plan"] = validate_plan(state["plan"])
-    return state
+    plan = validate_plan(state["plan"])
+    
+    # 不合法：自动拒绝，不询问
+    if not plan.is_valid:
+        return Command(
+            update={"plan": plan, "approved": False, "decision": "auto_reject_invalid"},
+            goto="skip",
+        )
+    return Command(update={"plan": plan}, goto="human_review")
 
 
 def node_human_review(state: JanitorState) -> JanitorState:
@@ -397,13 +450,8 @@ def node_human_review(state: JanitorState) -> JanitorState:
     fp = state["file_path"]
     plan = state["plan"]
 
-    # 1) 不合法：自动拒绝，不询问
-    if not plan.is_valid:
-        state["approved"] = False
-        state["decision"] = "auto_reject_invalid"
-        return state
-
-    # 2) 合法：打印摘要
+    # 不合法的计划已在 node_validate 中直接路由到 skip，这里只处理合法计划
+    # 打印摘要
     print(f"\n🧑‍⚖️  需要确认：{fp.name}")
     print(f"   → 新名字：{plan.new_name}")
     print(f"   → 目标目录：{plan.dest_dir}")
@@ -429,11 +477,11 @@ def node_human_review(state: JanitorState) -> JanitorState:
         state["decision"] = "approved"
     else:
         # 非自动批准模式：保存为待审批 JSON
-        import json
-        from datetime import datetime
+        # 文件名时间戳与 created_at 使用同一时刻
+        now = datetime.now()
         
         # 生成唯一文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:20]
+        timestamp = now.strftime("%Y%m%d_%H%M%S_%f")[:20]
         safe_filename = fp.stem.replace(" ", "_")[:30]  # 限制长度，避免路径过长
         pending_filename = f"plan_{timestamp}_{safe_filename}.json"
         pending_path = Path("pending") / pending_filename
@@ -449,7 +497,7 @@ def node_human_review(state: JanitorState) -> JanitorState:
             "extracted": plan.extracted,
             "rationale": plan.rationale,
             "preview": state.get("preview", "")[:500],  # 保存前500字符预览
-            "created_at": datetime.now().isoformat(),
+            "created_at": now.isoformat(),
             "status": "pending",
             # 🆕 OCR V2: 记录质量问题标记
             "ocr_quality_issue": ocr_needs_review,
@@ -458,8 +506,7 @@ def node_human_review(state: JanitorState) -> JanitorState:
         }
         
         # 保存到 JSON 文件
-        with pending_path.open("w", encoding="utf-8") as f:
-            json.dump(pending_data, f, ensure_ascii=False, indent=2)
+        pending_path.write_bytes(_dumpb(pending_data, indent=True))
         
         print(f"   ⏳ 计划已生成，等待 UI 审批")
         print(f"      文件：{pending_filename}")
@@ -609,15 +656,22 @@ def route_after_review(state: JanitorState) -> str:
 
 
 # --- 3. 构建图 (Graph) ---
-def build_graph():
-    """构建 LangGraph 状态图"""
+def build_graph(pre_analyzed: bool = False):
+    """
+    构建 LangGraph 状态图
+    
+    Args:
+        pre_analyzed: 为 True 时省略提取/分析节点，从 build_plan 开始
+                      （用于批量处理：预览和 LLM 分析已在图外批量完成）
+    """
 
     # 构建状态图
     g = StateGraph(JanitorState)
     
     # 添加节点
-    g.add_node("extract_preview", node_extract_preview)
-    g.add_node("llm_analyze", node_llm_analyze)
+    if not pre_analyzed:
+        g.add_node("extract_preview", node_extract_preview)
+        g.add_node("llm_analyze", node_llm_analyze)
     g.add_node("build_plan", node_build_plan)
     g.add_node("validate", node_validate)
     g.add_node("human_review", node_human_review)  # 🆕 新增
@@ -625,11 +679,14 @@ def build_graph():
     g.add_node("skip", node_skip)                  # 🆕 拆分后的节点
 
     # 定义边 (Edge)
-    g.set_entry_point("extract_preview")
-    g.add_edge("extract_preview", "llm_analyze")
-    g.add_edge("llm_analyze", "build_plan")
+    if pre_analyzed:
+        g.set_entry_point("build_plan")
+    else:
+        g.set_entry_point("extract_preview")
+        g.add_edge("extract_preview", "llm_analyze")
+        g.add_edge("llm_analyze", "build_plan")
     g.add_edge("build_plan", "validate")
-    g.add_edge("validate", "human_review")         # 🆕 validate 后进入人类确认
+    # validate 通过 Command 路由：合法 -> human_review，不合法 -> skip
 
     # 🆕 条件分支：根据人类决策路由
     g.add_conditional_edges(
@@ -644,10 +701,33 @@ def build_graph():
     return g.compile()
 
 
+@functools.lru_cache(maxsize=2)
+def get_compiled_graph(pre_analyzed: bool = False):
+    """
+    获取编译好的图（进程内单例：图结构固定且不含状态，多个 JanitorWorkflow 实例共享）
+    
+    Args:
+        pre_analyzed: 同 build_graph
+    """
+    return build_graph(pre_analyzed=pre_analyzed)
+
+
 # --- 辅助函数 ---
 def load_config(path: Path) -> dict:
-    """加载 YAML 配置文件"""
-    with path.open("r", encoding="utf-8") as f:
+    """
+    加载 YAML 配置文件
+    
+    按 (绝对路径, 修改时间) 缓存解析结果，文件变化时自动重新解析；
+    返回副本，调用方修改不会影响缓存
+    """
+    resolved = Path(path).resolve()
+    return copy.deepcopy(_load_config_cached(str(resolved), resolved.stat().st_mtime_ns))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(path_str: str, mtime_ns: int) -> dict:
+    """解析配置文件（mtime_ns 仅用作缓存键）"""
+    with open(path_str, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
 
@@ -694,17 +774,23 @@ class JanitorWorkflow:
         self.archive = Path(self.cfg["paths"]["archive"])
         self.logs = Path(self.cfg["paths"]["logs"])
         self.pending = Path("pending")  # 🆕 Step 7: 待审批目录
+        self.batch_jobs = self.pending / "batches"  # 已提交、尚未收取的 Batch API 任务
         
         # 4. 确保必要目录存在
         self.pending.mkdir(parents=True, exist_ok=True)
+        self.batch_jobs.mkdir(parents=True, exist_ok=True)
         
-        # 5. 编译 LangGraph 图（只编译一次，重复使用）
-        self.app = build_graph()
+        # 5. 获取编译好的 LangGraph 图（进程内只编译一次，各实例共享）
+        self.app = get_compiled_graph()
+        self.review_app = get_compiled_graph(pre_analyzed=True)  # 批量处理时使用
         
         # 6. 🆕 初始化 Memory 系统
         self.memory_db = MemoryDatabase()
         self.approval_repo = ApprovalRepository(self.memory_db)
         self.preference_repo = PreferenceRepository(self.memory_db)
+        # 审批记录由后台线程批量写入，处理流程不等待数据库提交；退出前写完剩余记录
+        self.approval_repo.start_writer()
+        atexit.register(self.approval_repo.stop_writer)
         self.session_id = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     def process_file(
@@ -753,31 +839,278 @@ class JanitorWorkflow:
         # 返回处理记录
         return final_state.get("record", {})
     
-    def _compute_file_hash(self, file_path: Path) -> str:
+    def process_files(
+        self,
+        file_paths: List[Path],
+        dry_run: bool = True,
+        auto_approve: bool = False,
+        max_preview: int = 1000,
+        batch_size: int = 8,
+        max_workers: int = 4,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
-        计算文件 hash（快速算法：文件大小 + 头部 8KB）
+        批量处理多个文件
+        
+        先并发提取所有文件的预览，再每 batch_size 个文件合并为一次 LLM 调用
+        （analyze_file_batch），最后逐个文件执行生成计划、校验、审批、移动。
+        与逐个调用 process_file 相比，N 次串行的 LLM 往返合并为约 N/batch_size 次并发请求。
         
         Args:
-            file_path: 文件路径
+            file_paths: 要处理的文件路径列表
+            dry_run: 是否为 dry-run 模式（只预览，不实际移动）
+            auto_approve: 是否自动批准（跳过人工确认）
+            max_preview: LLM 分析的最大文本长度
+            batch_size: 每次 LLM 调用包含的文件数
+            max_workers: 预览提取与 LLM 调用的最大并发数
+            on_record: 每个文件处理完成后立即回调其处理记录（如流式写日志）
         
         Returns:
-            SHA256 哈希字符串
+            与输入顺序一致的处理记录列表
         """
-        hasher = hashlib.sha256()
-        file_size = file_path.stat().st_size
+        if not file_paths:
+            return []
         
-        # 1. 写入文件大小
-        hasher.update(str(file_size).encode('utf-8'))
+        # 1. 并发提取预览（文件 I/O / OCR）
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            extracted = list(executor.map(lambda fp: extract_preview(fp, max_preview), file_paths))
         
-        # 2. 读取头部 8KB
-        try:
-            with open(file_path, 'rb') as f:
-                chunk = f.read(8192)
-                hasher.update(chunk)
-        except Exception:
-            pass
+        # 2. 批量 LLM 分析（失败的文件由 analyze_file_batch 回退为 fallback 结果）
+        analyses = analyze_file_batch(
+            [(preview, fp.name) for fp, (preview, _) in zip(file_paths, extracted)],
+            max_workers=max_workers,
+            batch_size=batch_size,
+            max_preview=max_preview
+        )
+        
+        # 3. 逐个文件执行后续节点（审批提示与移动需要按顺序进行）
+        return self._review_analyzed(
+            file_paths, extracted, analyses, dry_run, auto_approve, max_preview, on_record
+        )
+    
+    async def process_files_async(
+        self,
+        file_paths: List[Path],
+        dry_run: bool = True,
+        auto_approve: bool = False,
+        max_preview: int = 1000,
+        concurrency: int = 8,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发处理多个文件（每个文件单独调用 LLM）
+        
+        每个文件的预览提取（线程中执行）与 LLM 分析（analyze_file_async）流水线并发进行，
+        最多 concurrency 个文件同时在途；之后按输入顺序逐个执行生成计划、校验、审批、移动。
+        
+        Args:
+            file_paths: 要处理的文件路径列表
+            dry_run: 是否为 dry-run 模式（只预览，不实际移动）
+            auto_approve: 是否自动批准（跳过人工确认）
+            max_preview: LLM 分析的最大文本长度
+            concurrency: 同时处理的最大文件数
+            on_record: 每个文件处理完成后立即回调其处理记录（如流式写日志）
+        
+        Returns:
+            与输入顺序一致的处理记录列表
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def extract_and_analyze(fp: Path):
+            async with semaphore:
+                preview, metadata = await asyncio.to_thread(extract_preview, fp, max_preview)
+                analysis = await analyze_file_async(preview, fp.name, max_preview=max_preview)
+                return (preview, metadata), analysis
+        
+        results = await asyncio.gather(*(extract_and_analyze(fp) for fp in file_paths))
+        extracted = [item for item, _ in results]
+        analyses = [analysis for _, analysis in results]
+        
+        # 审批提示会读取标准输入、移动文件需要按顺序进行，放到线程中执行以免阻塞事件循环
+        return await asyncio.to_thread(
+            self._review_analyzed,
+            file_paths, extracted, analyses, dry_run, auto_approve, max_preview, on_record
+        )
+    
+    def _review_analyzed(
+        self,
+        file_paths: List[Path],
+        extracted: List[tuple],
+        analyses: list,
+        dry_run: bool,
+        auto_approve: bool,
+        max_preview: int,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """对已完成预览提取和 LLM 分析的文件，逐个执行生成计划、校验、审批、移动"""
+        records = []
+        total = len(file_paths)
+        for i, (fp, (preview, metadata), analysis) in enumerate(zip(file_paths, extracted, analyses), 1):
+            print(f"\n[{i}/{total}] 🔍 Processing: {fp.name}")
+            print("-" * 80)
+            print_extraction_log(metadata)
+            
+            state: JanitorState = {
+                "file_path": fp,
+                "cfg": self.cfg,
+                "archive_root": self.archive,
+                "dry_run": dry_run,
+                "max_preview": max_preview,
+                "auto_approve": auto_approve,
+                "preference_repo": self.preference_repo,
+                "preview": preview,
+                "extraction_metadata": metadata,
+                "analysis": analysis_to_dict(analysis),
+            }
+            final_state = self.review_app.invoke(state)
+            record = final_state.get("record", {})
+            records.append(record)
+            if on_record is not None:
+                on_record(record)
+        
+        return records
+    
+    def submit_batch_job(
+        self,
+        file_paths: List[Path],
+        max_preview: int = 1000,
+        max_workers: int = 4
+    ) -> Optional[str]:
+        """
+        提交离线批量分析任务（Batch API，24 小时内完成，费用约为实时分析的一半）
+        
+        先并发提取预览并计算文件哈希，内容相同的文件只发送一次请求；
+        任务清单（batch id 与各文件的预览/提取元数据）保存到 pending/batches/，
+        由 collect_batch_jobs 稍后收取。已在排队中的文件不会重复提交。
+        
+        Args:
+            file_paths: 要分析的文件路径列表
+            max_preview: LLM 分析的最大文本长度
+            max_workers: 预览提取与哈希计算的最大并发数
+        
+        Returns:
+            Batch 任务 ID；没有需要提交的文件时返回 None
+        """
+        queued = {entry["path"] for job in self.list_batch_jobs() for entry in job["files"]}
+        file_paths = [fp for fp in file_paths if str(fp) not in queued]
+        if not file_paths:
+            return None
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            extracted = list(executor.map(lambda fp: extract_preview(fp, max_preview), file_paths))
+            hashes = list(executor.map(compute_full_file_hash, file_paths))
+        
+        # custom_id 使用文件哈希：同一内容只请求一次
+        requests = {}
+        for fp, (preview, _), file_hash in zip(file_paths, extracted, hashes):
+            requests.setdefault(file_hash, (file_hash, preview, fp.name))
+        
+        batch_id = submit_batch_analysis(list(requests.values()), max_preview=max_preview)
+        
+        manifest = {
+            "batch_id": batch_id,
+            "created_at": datetime.now().isoformat(),
+            "max_preview": max_preview,
+            "files": [
+                {
+                    "custom_id": file_hash,
+                    "path": str(fp),
+                    "preview": preview,
+                    "extraction_metadata": metadata,
+                }
+                for fp, (preview, metadata), file_hash in zip(file_paths, extracted, hashes)
+            ],
+        }
+        (self.batch_jobs / f"{batch_id}.json").write_bytes(_dumpb(manifest, indent=True))
+        print(f"🌙 已提交 Batch 任务 {batch_id}：{len(file_paths)} 个文件，{len(requests)} 个请求")
+        return batch_id
+    
+    def list_batch_jobs(self) -> List[Dict[str, Any]]:
+        """
+        列出已提交、尚未收取的 Batch 任务清单
+        
+        Returns:
+            任务清单列表（按提交时间排序），每项额外包含清单文件路径 _manifest_file
+        """
+        jobs = []
+        for manifest_path in sorted(self.batch_jobs.glob("*.json")):
+            try:
+                data = manifest_path.read_bytes()
+                job = orjson.loads(data) if orjson is not None else json.loads(data)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  无法读取 Batch 任务清单 {manifest_path.name}: {e}")
+                continue
+            job["_manifest_file"] = str(manifest_path)
+            jobs.append(job)
+        return sorted(jobs, key=lambda job: job.get("created_at", ""))
+    
+    def collect_batch_jobs(
+        self,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> tuple[List[Dict[str, Any]], int]:
+        """
+        收取已完成的 Batch 任务，将分析结果送入待审批队列
+        
+        已完成的任务对每个仍在 inbox 中的文件执行生成计划、校验，并保存为待审批 JSON
+        （不自动批准、不移动文件），之后删除任务清单。失败/过期/取消的任务直接删除清单，
+        其中的文件留在 inbox，可重新提交。
+        
+        Args:
+            on_record: 每个文件处理完成后立即回调其处理记录
+        
+        Returns:
+            (处理记录列表, 仍在处理中的任务数)
+        """
+        records = []
+        running = 0
+        for job in self.list_batch_jobs():
+            batch_id = job["batch_id"]
+            manifest_path = Path(job["_manifest_file"])
+            filenames = {entry["custom_id"]: Path(entry["path"]).name for entry in job["files"]}
+            
+            try:
+                results = collect_batch_analysis(batch_id, filenames)
+            except RuntimeError as e:
+                print(f"❌ {e}，文件保留在 inbox 中")
+                manifest_path.unlink(missing_ok=True)
+                continue
+            except Exception as e:
+                # 网络等临时错误：保留清单，下次再收取
+                print(f"⚠️  查询 Batch 任务 {batch_id} 失败: {e}")
+                running += 1
+                continue
+            
+            if results is None:
+                running += 1
+                continue
+            
+            # 提交后已被移走/删除的文件跳过
+            entries = [entry for entry in job["files"] if Path(entry["path"]).exists()]
+            print(f"\n📥 Batch 任务 {batch_id}：{len(entries)} 个文件进入待审批队列")
+            records.extend(self._review_analyzed(
+                [Path(entry["path"]) for entry in entries],
+                [(entry["preview"], entry["extraction_metadata"]) for entry in entries],
+                [results[entry["custom_id"]] for entry in entries],
+                dry_run=True,
+                auto_approve=False,
+                max_preview=job.get("max_preview", 1000),
+                on_record=on_record
+            ))
+            manifest_path.unlink(missing_ok=True)
+        
+        return records, running
+    
+    def _compute_file_hash(self, file_path: Path) -> str:
+        """
+        计算文件 hash（整个文件的 SHA256，与 Web UI 写入的审批记录一致）
         
-        return hasher.hexdigest()
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            SHA256 哈希字符串
+        """
+        return compute_full_file_hash(file_path)
     
     def get_learned_folder(self, vendor: str, doc_type: str) -> Optional[str]:
         """
@@ -858,14 +1191,23 @@ class JanitorWorkflow:
                 'extraction_method': extraction_method
             }
             
-            # 保存到数据库
-            self.approval_repo.save_approval(log_data)
+            # 保存到数据库（入队后由后台线程写入）
+            self.approval_repo.enqueue_approval(log_data).add_done_callback(
+                _report_approval_save_failure
+            )
             
         except Exception as e:
             # 记录失败不影响主流程
             print(f"⚠️  Failed to save approval decision: {e}")
 
 
+def _report_approval_save_failure(future) -> None:
+    """后台写入审批记录失败时输出警告"""
+    error = future.exception()
+    if error is not None:
+        print(f"⚠️  Failed to save approval decision: {error}")
+
+
 # --- 主函数 ---
 
 def main():
@@ -881,6 +1223,8 @@ def main():
     ap.add_argument("--limit", type=int, default=10, help="处理文件数量限制")
     ap.add_argument("--auto-approve", action="store_true", help="自动批准所有合法计划（用于测试）")
     ap.add_argument("--execute", action="store_true", help="🆕 真实执行模式（移动文件），默认为 dry-run")
+    ap.add_argument("--batch-size", type=int, default=8, help="每次 LLM 调用分析的文件数（1 表示每个文件单独调用）")
+    ap.add_argument("--concurrency", type=int, default=8, help="同时进行的提取/LLM 调用数（1 表示串行处理）")
     args = ap.parse_args()
 
     # 2. 初始化工作流（加载配置、编译图）
@@ -910,29 +1254,61 @@ def main():
     print(f"🔧 Mode: {mode_str}\n")
     print("=" * 80)
 
-    # 5. 逐个处理文件
-    records = []
-    for i, fp in enumerate(files, 1):
-        print(f"\n[{i}/{len(files)}] 🔍 Processing: {fp.name}")
-        print("-" * 80)
-        
-        # 🆕 Step 6: 使用 workflow.process_file() 方法
-        record = workflow.process_file(
-            file_path=fp,
-            dry_run=dry_run,
-            auto_approve=args.auto_approve,
-            max_preview=args.preview
-        )
-        records.append(record)
-
-    # 6. 保存日志
+    # 5. 打开日志：每个文件处理完立即写入（中途崩溃时已处理文件的记录不会丢失）
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     mode_suffix = "dryrun" if dry_run else "execute"
     log_path = workflow.logs / f"graph_plan_{mode_suffix}_{ts}.jsonl"
-    with log_path.open("w", encoding="utf-8") as f:
-        for r in records:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-            
+    
+    with log_path.open("wb", buffering=1 << 16) as log_file:
+        written = 0
+        
+        def write_record(record: Dict[str, Any]) -> None:
+            nonlocal written
+            log_file.write(_dumpb(record))
+            log_file.write(b"\n")
+            written += 1
+            # 每 32 条刷新一次缓冲区
+            if written % 32 == 0:
+                log_file.flush()
+        
+        try:
+            # 6. 处理文件：多个文件时批量或并发分析，否则逐个处理
+            if args.batch_size > 1 and len(files) > 1:
+                workflow.process_files(
+                    files,
+                    dry_run=dry_run,
+                    auto_approve=args.auto_approve,
+                    max_preview=args.preview,
+                    batch_size=args.batch_size,
+                    max_workers=max(1, args.concurrency),
+                    on_record=write_record
+                )
+            elif args.concurrency > 1 and len(files) > 1:
+                asyncio.run(workflow.process_files_async(
+                    files,
+                    dry_run=dry_run,
+                    auto_approve=args.auto_approve,
+                    max_preview=args.preview,
+                    concurrency=args.concurrency,
+                    on_record=write_record
+                ))
+            else:
+                for i, fp in enumerate(files, 1):
+                    print(f"\n[{i}/{len(files)}] 🔍 Processing: {fp.name}")
+                    print("-" * 80)
+                    
+                    # 🆕 Step 6: 使用 workflow.process_file() 方法
+                    write_record(workflow.process_file(
+                        file_path=fp,
+                        dry_run=dry_run,
+                        auto_approve=args.auto_approve,
+                        max_preview=args.preview
+                    ))
+        finally:
+            # 关闭前落盘一次，保证日志在断电/系统崩溃后也完整
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
     print("-" * 80)
     print(f"✅ Completed. Log saved to: {log_path.name}")
     if not dry_run:
@@ -0,0 +1,180 @@
+"""
+Memory 写入队列、vendor 全文检索与文件移动测试
+使用临时数据库与临时目录，不依赖用户数据
+"""
+
+import pytest
+from pathlib import Path
+
+from core.memory import MemoryDatabase, ApprovalRepository, PreferenceRepository
+from core.memory import repository
+from utils import file_ops
+from utils.file_ops import safe_move_file
+
+
+def _log_data(index: int, vendor: str) -> dict:
+    """构造一条审批记录"""
+    return {
+        'session_id': 'test_session',
+        'file_hash': f'hash_{index}',
+        'original_filename': f'file_{index}.pdf',
+        'original_path': f'inbox/file_{index}.pdf',
+        'doc_type': 'invoice',
+        'vendor': vendor,
+        'confidence_score': 0.9,
+        'suggested_filename': f'file_{index}.pdf',
+        'suggested_folder': '发票/2024/03',
+        'final_filename': f'file_{index}.pdf',
+        'final_folder': '发票/2024/03',
+        'action': 'approved',
+    }
+
+
+@pytest.fixture
+def memory_db(tmp_path):
+    """临时 Memory 数据库"""
+    db = MemoryDatabase(tmp_path / "memory.db")
+    yield db
+    db.close()
+
+
+class TestApprovalWriter:
+    """后台审批写入队列测试类"""
+
+    def test_enqueue_without_writer_saves_synchronously(self, memory_db):
+        """未启动写入线程时入队即同步写入"""
+        repo = ApprovalRepository(memory_db)
+        future = repo.enqueue_approval(_log_data(1, "阿里云"))
+        assert future.result(timeout=5) > 0
+        assert len(repo.get_recent_approvals(limit=10)) == 1
+
+    def test_writer_flushes_all_on_stop(self, memory_db):
+        """写入线程停止前写完队列中的全部记录"""
+        repo = ApprovalRepository(memory_db)
+        repo.start_writer(max_batch=4, flush_interval=0.05)
+        try:
+            futures = [repo.enqueue_approval(_log_data(i, "腾讯科技")) for i in range(10)]
+        finally:
+            repo.stop_writer(timeout=10)
+
+        ids = [f.result(timeout=5) for f in futures]
+        assert len(set(ids)) == 10
+        assert len(repo.get_recent_approvals(limit=50)) == 10
+
+
+class TestTransaction:
+    """合并事务测试类"""
+
+    def test_failed_op_discards_later_writes(self, memory_db):
+        """块内操作失败后，之后 flush 的写入不会被块外的 commit() 提交"""
+        repo = ApprovalRepository(memory_db)
+        with pytest.raises(RuntimeError):
+            with repo.transaction():
+                with pytest.raises(TypeError):
+                    repo.save_approval(dict(_log_data(1, "阿里云"), unknown_column=1))
+                repo.save_approval(_log_data(2, "阿里云"))
+
+        memory_db.commit()
+        assert repo.get_recent_approvals(limit=10) == []
+
+    def test_learning_failure_keeps_approvals(self, memory_db, monkeypatch):
+        """块内偏好学习失败只回滚偏好写入，审批记录照常提交"""
+        repo = ApprovalRepository(memory_db)
+        # 偏好行 flush 之后写审计日志时失败
+        monkeypatch.setattr(repository, "PreferenceAuditLog", None)
+        with repo.transaction():
+            repo.save_approval(dict(_log_data(1, "阿里云"), user_modified_folder=True))
+            repo.save_approval(_log_data(2, "腾讯科技"))
+
+        assert len(repo.get_recent_approvals(limit=10)) == 2
+        assert PreferenceRepository(memory_db).list_all_preferences(enabled_only=False) == []
+
+
+class TestPreferenceSnapshot:
+    """偏好快照测试类"""
+
+    def test_sees_writes_from_other_process(self, tmp_path):
+        """另一个进程（独立的数据库实例与快照）学习或禁用偏好后，读取立即反映"""
+        writer_db = MemoryDatabase(tmp_path / "memory.db")
+        reader_db = MemoryDatabase(tmp_path / "memory.db")
+        try:
+            writer = PreferenceRepository(writer_db)
+            reader = PreferenceRepository(reader_db)
+            context = {'vendor': '阿里云', 'doc_type': 'invoice'}
+            assert reader.get_preference('vendor_folder', context) is None
+
+            for _ in range(2):
+                writer.update_preference('vendor_folder', context, '财务/阿里云')
+            assert reader.get_preference('vendor_folder', context) == '财务/阿里云'
+
+            writer.disable_preference(writer.list_all_preferences()[0]['id'])
+            assert reader.get_preference('vendor_folder', context) is None
+        finally:
+            writer_db.close()
+            reader_db.close()
+
+
+class TestVendorSearch:
+    """vendor 子串检索测试类"""
+
+    def test_vendor_substring_match(self, memory_db):
+        """FTS（或 LIKE 回退）按子串匹配 vendor"""
+        repo = ApprovalRepository(memory_db)
+        repo.save_approvals_bulk([
+            _log_data(1, "阿里云计算有限公司"),
+            _log_data(2, "腾讯科技"),
+            _log_data(3, "阿里云"),
+        ])
+
+        long_match = repo.get_recent_approvals(limit=10, vendor="阿里云")
+        assert sorted(log['original_filename'] for log in long_match) == ['file_1.pdf', 'file_3.pdf']
+
+        # 少于 3 个字符时走 LIKE 回退
+        short_match = repo.get_recent_approvals(limit=10, vendor="腾讯")
+        assert [log['original_filename'] for log in short_match] == ['file_2.pdf']
+
+    def test_vendor_quotes_are_escaped(self, memory_db):
+        """关键字中的双引号不会破坏 FTS 查询"""
+        repo = ApprovalRepository(memory_db)
+        repo.save_approvals_bulk([_log_data(1, 'ACME "Global" Ltd')])
+        result = repo.get_recent_approvals(limit=10, vendor='"Global"')
+        assert [log['original_filename'] for log in result] == ['file_1.pdf']
+
+
+class TestSafeMoveFile:
+    """文件移动测试类"""
+
+    def test_move_creates_dirs_and_resolves_conflict(self, tmp_path):
+        """自动创建目标目录，重名时追加后缀"""
+        for name in ("a.txt", "b.txt"):
+            (tmp_path / name).write_text(name)
+        dst = tmp_path / "archive" / "发票" / "a.txt"
+
+        first = safe_move_file(tmp_path / "a.txt", dst)
+        second = safe_move_file(tmp_path / "b.txt", dst)
+
+        assert first["status"] == "success"
+        assert second["status"] == "success"
+        assert second["conflict_resolved"] is True
+        assert Path(second["dst"]).read_text() == "b.txt"
+
+    def test_move_recreates_directory_removed_mid_run(self, tmp_path):
+        """已记录的目标目录被外部删除后，移动时重新创建"""
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        target_dir = tmp_path / "archive"
+
+        assert safe_move_file(tmp_path / "a.txt", target_dir / "a.txt")["status"] == "success"
+        assert str(target_dir) in file_ops._ensured_dirs
+        (target_dir / "a.txt").unlink()
+        target_dir.rmdir()
+
+        result = safe_move_file(tmp_path / "b.txt", target_dir / "b.txt")
+        assert result["status"] == "success"
+        assert (target_dir / "b.txt").read_text() == "b"
+
+    def test_missing_source_fails(self, tmp_path):
+        """源文件不存在时返回失败"""
+        result = safe_move_file(tmp_path / "missing.txt", tmp_path / "out" / "missing.txt")
+        assert result["status"] == "failed"
+        assert "源文件不存在" in result["error"]
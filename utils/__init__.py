@@ -4,6 +4,7 @@ Utils 工具模块
 
 from utils.file_ops import (
     discover_files,
+    discover_files_iter,
     extract_text_preview,
     get_file_size_mb,
     is_allowed_extension
@@ -11,6 +12,7 @@ from utils.file_ops import (
 
 __all__ = [
     "discover_files",
+    "discover_files_iter",
     "extract_text_preview",
     "get_file_size_mb",
     "is_allowed_extension"
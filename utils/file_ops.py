@@ -4,6 +4,7 @@
 支持智能 OCR fallback 机制
 """
 
+import os
 import re
 import shutil
 import time
@@ -11,7 +12,7 @@ import logging
 import sqlite3
 import hashlib
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -24,7 +25,7 @@ def compute_file_hash(path: Path) -> str:
     """
     计算文件 hash（快速算法：文件大小 + 头部 8KB）
     
-    与 Memory 系统保持一致
+    仅用作 OCR 结果缓存键；Memory 审批记录使用 compute_full_file_hash
     
     Args:
         path: 文件路径
@@ -49,6 +50,32 @@ def compute_file_hash(path: Path) -> str:
     return hasher.hexdigest()
 
 
+def compute_full_file_hash(path: Path) -> str:
+    """
+    计算整个文件的 SHA256（流式读取）
+    
+    Memory 系统 approval_logs.file_hash 统一使用此哈希（CLI 与 Web UI 共用）
+    
+    Args:
+        path: 文件路径
+    
+    Returns:
+        SHA256 哈希字符串（文件不存在时为空输入的哈希）
+    """
+    if not path.exists():
+        return hashlib.sha256().hexdigest()
+    
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: C 层循环读取并计算
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        
+        hasher = hashlib.sha256()
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+
 def calculate_quality_score(text: str, confidence: float = 0.0) -> Tuple[int, bool]:
     """
     计算 OCR 结果质量评分
@@ -220,13 +247,28 @@ def discover_files(inbox: Path, ignore_hidden: bool = True) -> List[Path]:
     Returns:
         文件路径列表（按文件名排序）
     """
-    files: List[Path] = []
-    for p in inbox.iterdir():
-        if p.is_file():
-            if ignore_hidden and p.name.startswith("."):
+    return sorted(discover_files_iter(inbox, ignore_hidden), key=lambda x: x.name.lower())
+
+
+def discover_files_iter(inbox: Path, ignore_hidden: bool = True) -> Iterator[Path]:
+    """
+    惰性扫描目录中的文件（不排序，按目录项顺序逐个产出）
+    
+    只需要前 N 个文件时配合 itertools.islice 使用，可以在取够后停止扫描
+    
+    Args:
+        inbox: 要扫描的目录
+        ignore_hidden: 是否忽略隐藏文件（以 . 开头）
+    
+    Yields:
+        文件路径
+    """
+    with os.scandir(inbox) as it:
+        for entry in it:
+            if ignore_hidden and entry.name.startswith("."):
                 continue
-            files.append(p)
-    return sorted(files, key=lambda x: x.name.lower())
+            if entry.is_file():
+                yield inbox / entry.name
 
 
 # ==================== 智能 OCR 增强功能 ====================
@@ -298,8 +340,7 @@ def is_important_document(pdf_path: Path) -> bool:
         from config.ocr_config import OCR_CONFIG
         
         # 1. 检查文件名关键词
-        filename_lower = pdf_path.name.lower()
-        has_keyword = any(kw.lower() in filename_lower for kw in OCR_CONFIG.important_keywords)
+        has_keyword = OCR_CONFIG.has_important_keyword(pdf_path.name)
         
         # 2. 检查文件大小
         file_size_kb = pdf_path.stat().st_size / 1024
@@ -903,6 +944,27 @@ def resolve_collision(destination: Path, max_attempts: int = 100) -> Path:
     )
 
 
+# 本进程已确认存在的目标目录：批量移动时同一目录只 mkdir 一次
+_ensured_dirs: set = set()
+
+
+def _ensure_dir(directory: Path) -> None:
+    """创建目录（含父目录）；本进程内已创建过的目录直接跳过"""
+    key = str(directory)
+    if key in _ensured_dirs:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    _ensured_dirs.add(key)
+
+
+def _move(src: Path, dst: Path) -> None:
+    """移动文件：同一文件系统内直接 rename，跨设备等情况回退到 shutil.move（复制 + 删除）"""
+    try:
+        os.rename(src, dst)
+    except OSError:
+        shutil.move(str(src), str(dst))
+
+
 def safe_move_file(
     src: Path,
     dst: Path,
@@ -987,7 +1049,7 @@ def safe_move_file(
         # 3. 创建目标父目录
         if create_dirs:
             try:
-                final_dst.parent.mkdir(parents=True, exist_ok=True)
+                _ensure_dir(final_dst.parent)
             except Exception as e:
                 result["error"] = f"无法创建目标目录 {final_dst.parent}: {e}"
                 return result
@@ -999,7 +1061,15 @@ def safe_move_file(
         
         # 4. 执行移动操作
         try:
-            shutil.move(str(src), str(final_dst))
+            try:
+                _move(src, final_dst)
+            except FileNotFoundError:
+                # 目录在本次运行中被外部删除（_ensure_dir 的记录已过期）：重新创建后重试
+                if not create_dirs or final_dst.parent.is_dir():
+                    raise
+                _ensured_dirs.discard(str(final_dst.parent))
+                _ensure_dir(final_dst.parent)
+                _move(src, final_dst)
             result["status"] = "success"
             result["dst"] = str(final_dst)
             # 移除 error 字段（如果之前有的话）